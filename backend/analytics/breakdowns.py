@@ -0,0 +1,98 @@
+"""
+学年 × サーフェス × テスト形式ごとの集計（SQL の GROUP BY とウィンドウ関数）
+
+1クエリで次を求めます（PostgreSQL / SQLite 共通の SQL）。
+- 内側: 種目ごとに ROW_NUMBER() OVER (PARTITION BY 学年, serfece, test_format
+  ORDER BY 値) と、グループの件数 COUNT(*) OVER (...)
+- 外側: GROUP BY で件数・平均・二乗平均と、順位が p × 件数 以上の最小値
+  （nearest-rank のパーセンタイル）
+
+標準偏差は二乗平均と平均から求めます（SQLite に sqrt / stddev が無いため、
+グループ数分だけ Python で平方根を取る）。user_results 側は
+idx_user_results_breakdown のカバリングインデックス（確認前の外れ値を除いた
+部分インデックス）だけで読めます。
+"""
+import math
+from typing import List, Optional
+
+from sqlalchemy import case, func, select
+from sqlalchemy.orm import Session
+
+from .. import models
+from ..metrics import FITNESS_METRICS
+from .grade_stats import counted, grade_filter
+
+PERCENTILES = {"p50": 0.5, "p90": 0.9}
+
+
+def breakdowns(
+    db: Session,
+    grade: Optional[str] = None,
+    serfece: Optional[int] = None,
+    test_format: Optional[int] = None,
+) -> List[dict]:
+    grade_col = func.coalesce(models.User.grade, "").label("grade")
+    partition = [
+        func.coalesce(models.User.grade, ""),
+        models.UserResult.serfece,
+        models.UserResult.test_format,
+    ]
+    ranked = [
+        grade_col,
+        models.UserResult.serfece,
+        models.UserResult.test_format,
+        func.count().over(partition_by=partition).label("n"),
+    ]
+    for metric in FITNESS_METRICS:
+        col = getattr(models.UserResult, metric)
+        ranked.append(col.label(metric))
+        ranked.append(
+            func.row_number().over(partition_by=partition, order_by=col).label(f"{metric}__rank")
+        )
+    inner = (
+        select(*ranked)
+        .join(models.User, models.UserResult.user_id == models.User.id)
+        .where(counted())
+    )
+    if grade is not None:
+        inner = inner.where(grade_filter(grade))
+    if serfece is not None:
+        inner = inner.where(models.UserResult.serfece == serfece)
+    if test_format is not None:
+        inner = inner.where(models.UserResult.test_format == test_format)
+    sub = inner.subquery()
+
+    aggregates = [sub.c.grade, sub.c.serfece, sub.c.test_format, func.count().label("count")]
+    for metric in FITNESS_METRICS:
+        value, rank = sub.c[metric], sub.c[f"{metric}__rank"]
+        aggregates.append(func.avg(value).label(f"{metric}__mean"))
+        aggregates.append(func.avg(value * value).label(f"{metric}__mean_sq"))
+        for name, p in PERCENTILES.items():
+            aggregates.append(
+                func.min(case((rank >= p * sub.c.n, value))).label(f"{metric}__{name}")
+            )
+    stmt = (
+        select(*aggregates)
+        .group_by(sub.c.grade, sub.c.serfece, sub.c.test_format)
+        .order_by(sub.c.grade, sub.c.serfece, sub.c.test_format)
+    )
+
+    groups = []
+    for row in db.execute(stmt).mappings():
+        metrics = {}
+        for metric in FITNESS_METRICS:
+            mean = float(row[f"{metric}__mean"])
+            variance = max(float(row[f"{metric}__mean_sq"]) - mean * mean, 0.0)
+            metrics[metric] = {
+                "mean": mean,
+                "stddev": math.sqrt(variance),
+                **{name: float(row[f"{metric}__{name}"]) for name in PERCENTILES},
+            }
+        groups.append({
+            "grade": row["grade"],
+            "serfece": row["serfece"],
+            "test_format": row["test_format"],
+            "count": row["count"],
+            "metrics": metrics,
+        })
+    return groups
@@ -0,0 +1,93 @@
+"""
+学年別の平均値・最高記録のプロセス内スナップショット
+
+`average_data` / `max_data`（数十行）を2クエリでまとめて読み込み、
+レンダリング済みの JSON と ETag を保持します。更新系エンドポイントと
+測定結果のイベント（backend.result_events）で破棄し、他ワーカーでの
+更新は GRADE_DATA_CACHE_TTL で反映されます。
+
+非同期セッションからは `await db.run_sync(get_grade_data)` で取得します。
+"""
+import os
+from typing import Dict, List, Tuple
+
+from pydantic import TypeAdapter
+from sqlalchemy.orm import Session
+
+from .. import models, result_events
+from ..cache import TTLCache, make_etag
+from ..schemas import AverageDataResponse, GradeData, MaxDataResponse
+
+GRADE_DATA_CACHE_TTL = float(os.getenv("GRADE_DATA_CACHE_TTL", "300"))
+grade_data_cache = TTLCache(max_size=1, ttl_seconds=GRADE_DATA_CACHE_TTL)
+_GRADE_DATA_KEY = "grades"
+
+_grade_list_adapter = TypeAdapter(List[GradeData])
+
+# (本文, ETag)
+Rendered = Tuple[bytes, str]
+
+
+def _render(body: bytes) -> Rendered:
+    return body, make_etag(body)
+
+
+class GradeDataSnapshot:
+    """average_data / max_data 全行のレンダリング済みレスポンス"""
+
+    def __init__(self, averages: List[models.AverageData], maxima: List[models.MaxData]) -> None:
+        self.average: Dict[str, Rendered] = {
+            row.grade: _render(AverageDataResponse.model_validate(row).model_dump_json().encode())
+            for row in averages
+        }
+        self.max: Dict[str, Rendered] = {
+            row.grade: _render(MaxDataResponse.model_validate(row).model_dump_json().encode())
+            for row in maxima
+        }
+        by_grade: Dict[str, GradeData] = {}
+        self.by_grade = by_grade
+        for row in averages:
+            by_grade.setdefault(row.grade, GradeData(grade=row.grade)).average = (
+                AverageDataResponse.model_validate(row)
+            )
+        for row in maxima:
+            by_grade.setdefault(row.grade, GradeData(grade=row.grade)).max = (
+                MaxDataResponse.model_validate(row)
+            )
+        self.grades: Rendered = _render(
+            _grade_list_adapter.dump_json([by_grade[g] for g in sorted(by_grade)])
+        )
+
+
+def get_grade_data(db: Session) -> GradeDataSnapshot:
+    snapshot = grade_data_cache.get(_GRADE_DATA_KEY)
+    if snapshot is None:
+        generation = grade_data_cache.generation
+        # 破棄直後の読み込みは、更新が届いていないレプリカではなくプライマリから読む
+        db.use_replica = False
+        snapshot = GradeDataSnapshot(
+            db.query(models.AverageData).all(), db.query(models.MaxData).all()
+        )
+        # 読み込み中に破棄されていたら古い可能性があるため保存しない
+        grade_data_cache.set_if_current(_GRADE_DATA_KEY, snapshot, generation)
+    return snapshot
+
+
+def invalidate_grade_data() -> None:
+    grade_data_cache.invalidate(_GRADE_DATA_KEY)
+
+
+class _GradeDataInvalidator:
+    """測定結果の登録・削除・学年変更で average_data / max_data が変わるため破棄する"""
+
+    def on_results_added(self, rows) -> None:
+        invalidate_grade_data()
+
+    def on_result_deleted(self, row) -> None:
+        invalidate_grade_data()
+
+    def on_user_grade_changed(self, user_id, old_grade, new_grade) -> None:
+        invalidate_grade_data()
+
+
+result_events.register(_GradeDataInvalidator())
@@ -0,0 +1,309 @@
+"""
+学年 × 種目の集計（件数・合計・二乗和・最小・最大）
+
+`grade_metric_stats` テーブルに集計値を持ち、測定結果の登録・削除・
+ユーザーの学年変更と同じトランザクションで差分更新します。
+`average_data` / `max_data` は更新のあった学年だけここから再計算するため、
+`/average_data/grade/{grade}` などは常に1行の参照で済みます。
+
+- 登録: UPSERT で count / sum / sum_sq を加算し、min / max を更新
+- 削除: 減算のみ。削除した値が min / max と一致したときだけ、
+  その学年の min / max を user_results から取り直す
+- 平均 = value_sum / value_count、分散 = value_sum_sq / value_count - 平均²
+- `max_data` は種目ごとの最高記録（タイム系は最小値）
+- total_score（合計 T スコアの平均・最高）も同じ学年について取り直す。
+  T スコアは集計の平均・標準偏差で決まる1次式なので、学年の結果に対する
+  AVG / MAX の1クエリで求まる
+- 測定結果が無くなった学年の行は消さない（手入力の参照値の場合がある）
+- 外れ値の疑いで保留中の結果（user_results.anomaly が NULL でない行）は、
+  確認されるまでどの集計にも含めない（`counted()`）
+
+関数は同期の Session / Connection を受け取ります。非同期セッションからは
+`await db.run_sync(grade_stats.apply, added, removed)` で呼び出します。
+"""
+import math
+from collections import defaultdict
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import case, delete, func, or_, select
+
+from .. import models
+from ..metrics import FITNESS_METRICS, higher_is_better
+
+stats_table = models.GradeMetricStats.__table__
+c = stats_table.c
+
+# (grade, {metric: value}) の組。grade は None を "" として扱う
+ResultValues = Tuple[Optional[str], Dict[str, Optional[float]]]
+
+
+def dialect_insert(conn):
+    """接続先に合わせた UPSERT 用の insert（PostgreSQL / SQLite）"""
+    # Connection は .dialect を、Session は get_bind() 経由で持つ
+    dialect = conn.dialect if hasattr(conn, "dialect") else conn.get_bind().dialect
+    if dialect.name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+    return insert
+
+
+def counted():
+    """集計に含める結果の条件（外れ値の疑いで保留中の行を除く）"""
+    return models.UserResult.anomaly.is_(None)
+
+
+def grade_filter(grade: str):
+    """users.grade の条件（"" は学年未設定の None も含む）"""
+    if grade == "":
+        return or_(models.User.grade.is_(None), models.User.grade == "")
+    return models.User.grade == grade
+
+
+def values_of(row) -> Dict[str, Optional[float]]:
+    """UserResult・result_events の行・dict から種目の値を取り出す"""
+    if isinstance(row, dict):
+        return {m: row.get(m) for m in FITNESS_METRICS}
+    return {m: getattr(row, m, None) for m in FITNESS_METRICS}
+
+
+def _deltas(rows: Iterable[ResultValues], sign: int) -> Dict[Tuple[str, str], list]:
+    """(grade, metric) → [件数, 合計, 二乗和, 最小, 最大]"""
+    deltas: Dict[Tuple[str, str], list] = {}
+    for grade, values in rows:
+        for metric in FITNESS_METRICS:
+            value = values.get(metric)
+            if value is None:
+                continue
+            value = float(value)
+            key = (grade or "", metric)
+            d = deltas.get(key)
+            if d is None:
+                deltas[key] = [sign, sign * value, sign * value * value, value, value]
+            else:
+                d[0] += sign
+                d[1] += sign * value
+                d[2] += sign * value * value
+                d[3] = min(d[3], value)
+                d[4] = max(d[4], value)
+    return deltas
+
+
+def _upsert(conn, deltas: Dict[Tuple[str, str], list], track_extremes: bool) -> None:
+    if not deltas:
+        return
+    insert = dialect_insert(conn)
+    stmt = insert(stats_table).values([
+        {
+            "grade": grade,
+            "metric": metric,
+            "value_count": d[0],
+            "value_sum": d[1],
+            "value_sum_sq": d[2],
+            "min_value": d[3] if track_extremes else None,
+            "max_value": d[4] if track_extremes else None,
+        }
+        for (grade, metric), d in deltas.items()
+    ])
+    excluded = stmt.excluded
+    set_ = {
+        "value_count": c.value_count + excluded.value_count,
+        "value_sum": c.value_sum + excluded.value_sum,
+        "value_sum_sq": c.value_sum_sq + excluded.value_sum_sq,
+    }
+    if track_extremes:
+        set_["min_value"] = case(
+            (or_(c.min_value.is_(None), excluded.min_value < c.min_value), excluded.min_value),
+            else_=c.min_value,
+        )
+        set_["max_value"] = case(
+            (or_(c.max_value.is_(None), excluded.max_value > c.max_value), excluded.max_value),
+            else_=c.max_value,
+        )
+    conn.execute(stmt.on_conflict_do_update(
+        index_elements=[c.grade, c.metric], set_=set_))
+
+
+def _recompute_extremes(conn, grades: Iterable[str]) -> None:
+    """学年の min / max を user_results から取り直す（件数0なら集計をリセット）"""
+    for grade in grades:
+        columns = []
+        for metric in FITNESS_METRICS:
+            col = getattr(models.UserResult, metric)
+            columns += [func.min(col), func.max(col)]
+        row = conn.execute(
+            select(*columns)
+            .select_from(models.UserResult)
+            .join(models.User, models.UserResult.user_id == models.User.id)
+            .where(grade_filter(grade), counted())
+        ).one()
+        for i, metric in enumerate(FITNESS_METRICS):
+            lo, hi = row[2 * i], row[2 * i + 1]
+            values = {"min_value": lo, "max_value": hi}
+            if lo is None:
+                values.update(value_count=0, value_sum=0.0, value_sum_sq=0.0)
+            conn.execute(
+                stats_table.update()
+                .where(c.grade == grade, c.metric == metric)
+                .values(**values)
+            )
+
+
+def _grade_totals(conn, grade: str, metrics: Dict[str, dict]) -> Tuple[float, float]:
+    """学年の合計 T スコアの (平均, 最高)。backend.analytics.scores.t_scores と同じ定義
+
+    T の合計 = 50 × 種目数 + Σ w_j (x_j - 平均_j)、w_j = ±10 / 標準偏差_j
+    （タイム系は負、標準偏差 0 の種目は寄与しない）
+    """
+    base = 50.0 * len(FITNESS_METRICS)
+    terms = []
+    offset = 0.0
+    for metric in FITNESS_METRICS:
+        s = summary(metrics[metric])
+        if not s["stddev"]:
+            continue
+        weight = (10.0 if higher_is_better(metric) else -10.0) / s["stddev"]
+        terms.append(getattr(models.UserResult, metric) * weight)
+        offset += weight * s["mean"]
+    if not terms:
+        return base, base
+    expr = terms[0]
+    for term in terms[1:]:
+        expr = expr + term
+    avg, best = conn.execute(
+        select(func.avg(expr), func.max(expr))
+        .select_from(models.UserResult)
+        .join(models.User, models.UserResult.user_id == models.User.id)
+        .where(grade_filter(grade), counted())
+    ).one()
+    if avg is None:
+        return base, base
+    return base + float(avg) - offset, base + float(best) - offset
+
+
+def refresh_summaries(conn, grades: Iterable[str]) -> None:
+    """指定学年の average_data / max_data を集計から作り直す"""
+    grades = [g for g in set(grades) if g]
+    if not grades:
+        return
+    by_grade: Dict[str, Dict[str, dict]] = defaultdict(dict)
+    for row in conn.execute(select(stats_table).where(c.grade.in_(grades))).mappings():
+        by_grade[row["grade"]][row["metric"]] = row
+
+    insert = dialect_insert(conn)
+    for grade in grades:
+        metrics = by_grade.get(grade, {})
+        if any(metrics.get(m) is None or metrics[m]["value_count"] <= 0 for m in FITNESS_METRICS):
+            # 集計できない学年は既存の行（手入力の値かもしれない）をそのまま残す
+            continue
+        mean_total, max_total = _grade_totals(conn, grade, metrics)
+        averages = {m: summary(metrics[m])["mean"] for m in FITNESS_METRICS}
+        averages["total_score"] = mean_total
+        bests = {
+            m: int(round(metrics[m]["max_value" if higher_is_better(m) else "min_value"]))
+            for m in FITNESS_METRICS
+        }
+        bests["total_score"] = int(round(max_total))
+        for model, values in ((models.AverageData, averages), (models.MaxData, bests)):
+            stmt = insert(model).values(grade=grade, **values)
+            conn.execute(stmt.on_conflict_do_update(
+                index_elements=[model.grade],
+                set_={key: getattr(stmt.excluded, key) for key in values},
+            ))
+
+
+def apply(
+    conn,
+    added: Iterable[ResultValues] = (),
+    removed: Iterable[ResultValues] = (),
+) -> None:
+    """登録・削除された測定結果を集計に反映する（呼び出し側でコミット）
+
+    削除分は user_results から既に消えている（flush 済み）必要があります。
+    """
+    plus = _deltas(added, 1)
+    minus = _deltas(removed, -1)
+    _upsert(conn, plus, track_extremes=True)
+    if minus:
+        current = {
+            (row["grade"], row["metric"]): row
+            for row in conn.execute(
+                select(stats_table).where(c.grade.in_({g for g, _ in minus}))
+            ).mappings()
+        }
+        _upsert(conn, minus, track_extremes=False)
+        stale = set()
+        for key, d in minus.items():
+            row = current.get(key)
+            if row is None or row["value_count"] + d[0] <= 0:
+                stale.add(key[0])
+            elif (row["min_value"] is not None and d[3] <= row["min_value"]) or (
+                row["max_value"] is not None and d[4] >= row["max_value"]
+            ):
+                stale.add(key[0])
+        _recompute_extremes(conn, stale)
+    refresh_summaries(conn, {g for g, _ in plus} | {g for g, _ in minus})
+
+
+def move_user(conn, user_id, old_grade: Optional[str], new_grade: Optional[str]) -> None:
+    """ユーザーの学年変更に合わせて、その全結果を旧学年から新学年へ移す
+
+    users.grade の更新は flush 済みである必要があります。
+    """
+    if (old_grade or "") == (new_grade or ""):
+        return
+    columns = [getattr(models.UserResult, m) for m in FITNESS_METRICS]
+    results = conn.execute(
+        select(*columns).where(models.UserResult.user_id == user_id, counted())
+    ).all()
+    if not results:
+        return
+    values = [dict(zip(FITNESS_METRICS, row)) for row in results]
+    apply(
+        conn,
+        added=[(new_grade, v) for v in values],
+        removed=[(old_grade, v) for v in values],
+    )
+
+
+def rebuild(conn) -> None:
+    """user_results 全体から集計を作り直す（マイグレーション・復旧用）"""
+    aggregates = []
+    for metric in FITNESS_METRICS:
+        col = getattr(models.UserResult, metric)
+        aggregates.append(
+            select(
+                func.coalesce(models.User.grade, "").label("grade"),
+                func.count(col),
+                func.sum(col),
+                func.sum(col * col),
+                func.min(col),
+                func.max(col),
+            )
+            .select_from(models.UserResult)
+            .join(models.User, models.UserResult.user_id == models.User.id)
+            .where(counted())
+            .group_by(func.coalesce(models.User.grade, ""))
+        )
+    conn.execute(delete(stats_table))
+    rows: List[dict] = []
+    for metric, stmt in zip(FITNESS_METRICS, aggregates):
+        for grade, count, total, total_sq, lo, hi in conn.execute(stmt):
+            rows.append({
+                "grade": grade, "metric": metric, "value_count": count,
+                "value_sum": total or 0.0, "value_sum_sq": total_sq or 0.0,
+                "min_value": lo, "max_value": hi,
+            })
+    if rows:
+        conn.execute(stats_table.insert(), rows)
+    refresh_summaries(conn, {row["grade"] for row in rows})
+
+
+def summary(row) -> Dict[str, Optional[float]]:
+    """集計行（mapping）の件数・平均・標準偏差（母集団）"""
+    n = row["value_count"]
+    if not n:
+        return {"count": 0, "mean": None, "stddev": None}
+    mean = row["value_sum"] / n
+    variance = max(row["value_sum_sq"] / n - mean * mean, 0.0)
+    return {"count": n, "mean": mean, "stddev": math.sqrt(variance)}
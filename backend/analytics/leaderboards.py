@@ -0,0 +1,255 @@
+"""
+学年 × 種目のリーダーボード（選手ごとの自己ベストの上位 K 件）
+
+- `user_personal_bests`: 選手 × 種目 × サーフェス × テスト形式ごとの自己ベスト。
+  測定結果の登録・削除と同じトランザクションで更新する（登録は UPSERT で
+  良い方を残し、削除はその選手の結果から取り直す）
+- `Leaderboards`: ボード（学年, 種目, serfece, test_format）ごとに、自己ベストを
+  良い順に並べたリストをプロセス内に保持する。初回参照時に
+  `user_personal_bests` から1クエリで読み込み、以降は result_events で
+  差分更新する。上位 K 件は先頭のスライスなので O(K) で返せる。
+  他ワーカーでの登録・削除はイベントで届かないため、ボードは
+  LEADERBOARD_CACHE_TTL 秒で読み直す
+
+serfece / test_format の 0（ANY）は条件なし（NULL の結果も含む）です。
+同じ記録は測定日の早い方を上位にします。
+
+関数は同期の Session / Connection を受け取ります。非同期セッションからは
+`await db.run_sync(leaderboards.apply, added, removed)` で呼び出します。
+"""
+import bisect
+import datetime
+import os
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import case, delete, or_, select
+
+from .. import models, result_events
+from ..metrics import FITNESS_METRICS, higher_is_better
+from .grade_stats import counted, dialect_insert, grade_filter
+
+ANY = 0
+
+LEADERBOARD_CACHE_TTL = float(os.getenv("LEADERBOARD_CACHE_TTL", "300"))
+
+bests_table = models.UserPersonalBest.__table__
+c = bests_table.c
+
+# (user_id, metric, serfece, test_format)
+BestKey = Tuple[object, str, int, int]
+
+
+def _conditions(row: dict) -> List[Tuple[int, int]]:
+    """結果が載るボードの (serfece, test_format) の組"""
+    s, t = row.get("serfece"), row.get("test_format")
+    pairs = [(ANY, ANY)]
+    if s is not None:
+        pairs.append((s, ANY))
+    if t is not None:
+        pairs.append((ANY, t))
+    if s is not None and t is not None:
+        pairs.append((s, t))
+    return pairs
+
+
+def _better(metric: str, a: float, b: float) -> bool:
+    return a > b if higher_is_better(metric) else a < b
+
+
+def _bests(rows: Iterable[dict]) -> Dict[BestKey, Tuple[float, datetime.date]]:
+    """結果の行から (user, 種目, 条件) ごとの自己ベスト（同値は古い日付）を求める"""
+    bests: Dict[BestKey, Tuple[float, datetime.date]] = {}
+    for row in rows:
+        for s, t in _conditions(row):
+            for metric in FITNESS_METRICS:
+                value = row.get(metric)
+                if value is None:
+                    continue
+                key = (row["user_id"], metric, s, t)
+                current = bests.get(key)
+                if (
+                    current is None
+                    or _better(metric, value, current[0])
+                    or (value == current[0] and row["date"] < current[1])
+                ):
+                    bests[key] = (float(value), row["date"])
+    return bests
+
+
+def _result_rows(conn, user_ids=None) -> List[dict]:
+    columns = [getattr(models.UserResult, m) for m in FITNESS_METRICS]
+    stmt = select(
+        models.UserResult.user_id,
+        models.UserResult.date,
+        models.UserResult.serfece,
+        models.UserResult.test_format,
+        *columns,
+    ).where(counted())
+    if user_ids is not None:
+        stmt = stmt.where(models.UserResult.user_id.in_(user_ids))
+    return [dict(row) for row in conn.execute(stmt).mappings()]
+
+
+def _insert_rows(bests: Dict[BestKey, Tuple[float, datetime.date]]) -> List[dict]:
+    return [
+        {"user_id": u, "metric": m, "serfece": s, "test_format": t, "value": v, "date": d}
+        for (u, m, s, t), (v, d) in bests.items()
+    ]
+
+
+def apply(conn, added: Iterable[dict] = (), removed: Iterable[dict] = ()) -> None:
+    """登録・削除された測定結果を自己ベストに反映する（呼び出し側でコミット）
+
+    行は user_id / date / serfece / test_format と各種目の値を持つ dict。
+    削除分は user_results から既に消えている（flush 済み）必要があります。
+    """
+    bests = _bests(added)
+    if bests:
+        insert = dialect_insert(conn)
+        # 1選手あたり最大 種目数 × 4 条件の行になるため、複数行 VALUES の1文ではなく
+        # executemany にする（バインド変数の上限に掛からず、ドライバがまとめて送る）
+        stmt = insert(bests_table)
+        excluded = stmt.excluded
+        # 種目ごとに良し悪しの向きが違うため、向きに応じた比較で良い方を残す
+        # （executemany では IN の展開パラメータが使えないため OR で並べる）
+        replace = case(
+            (or_(*(c.metric == m for m in FITNESS_METRICS if higher_is_better(m))),
+             excluded.value > c.value),
+            else_=excluded.value < c.value,
+        ) | ((excluded.value == c.value) & (excluded.date < c.date))
+        conn.execute(
+            stmt.on_conflict_do_update(
+                index_elements=[c.user_id, c.metric, c.serfece, c.test_format],
+                set_={
+                    "value": case((replace, excluded.value), else_=c.value),
+                    "date": case((replace, excluded.date), else_=c.date),
+                },
+            ),
+            _insert_rows(bests),
+        )
+    # 削除は、消えた結果が自己ベストだったかに関わらずその選手の分を取り直す
+    # （user_id のインデックスで選手1人分の結果を読むだけ）
+    user_ids = {row["user_id"] for row in removed}
+    if user_ids:
+        conn.execute(delete(bests_table).where(c.user_id.in_(user_ids)))
+        rows = _insert_rows(_bests(_result_rows(conn, user_ids)))
+        if rows:
+            conn.execute(bests_table.insert(), rows)
+
+
+def rebuild(conn) -> None:
+    """user_results 全体から自己ベストを作り直す（マイグレーション・復旧用）"""
+    conn.execute(delete(bests_table))
+    rows = _insert_rows(_bests(_result_rows(conn)))
+    if rows:
+        conn.execute(bests_table.insert(), rows)
+
+
+class Board:
+    """1ボード分の自己ベスト（良い順）"""
+
+    def __init__(self, metric: str) -> None:
+        self.metric = metric
+        self._sign = -1.0 if higher_is_better(metric) else 1.0
+        # (並び順のキー, 測定日, user_id の文字列, user_id)。昇順で良い順になる
+        self._order: List[tuple] = []
+        self._entries: Dict[object, tuple] = {}
+        self.loaded_at = time.monotonic()
+
+    def offer(self, user_id, value: float, date: datetime.date) -> None:
+        """記録を追加する（その選手の現在の自己ベストより良ければ置き換える）"""
+        key = (self._sign * value, date, str(user_id), user_id)
+        current = self._entries.get(user_id)
+        if current is not None:
+            if current <= key:
+                return
+            del self._order[bisect.bisect_left(self._order, current)]
+        bisect.insort(self._order, key)
+        self._entries[user_id] = key
+
+    def load(self, rows: Iterable[tuple]) -> None:
+        """(user_id, 記録, 測定日) の自己ベストでボードを作る（1選手1行）"""
+        self._entries = {
+            user_id: (self._sign * value, date, str(user_id), user_id)
+            for user_id, value, date in rows
+        }
+        self._order = sorted(self._entries.values())
+
+    def __len__(self) -> int:
+        return len(self._order)
+
+    def top(self, limit: int) -> List[Tuple[int, object, float, datetime.date]]:
+        """上位 limit 件の (順位, user_id, 記録, 測定日)。同じ記録は同順位"""
+        entries = []
+        rank = 0
+        previous = None
+        for i, (sort_value, date, _, user_id) in enumerate(self._order[:limit]):
+            if sort_value != previous:
+                rank, previous = i + 1, sort_value
+            entries.append((rank, user_id, self._sign * sort_value, date))
+        return entries
+
+
+class Leaderboards:
+    """ボード（学年, 種目, serfece, test_format）のプロセス内キャッシュ"""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._boards: Dict[tuple, Board] = {}
+        self._generation = 0
+
+    def board(self, db, grade: str, metric: str, serfece: int = ANY, test_format: int = ANY) -> Board:
+        key = (grade or "", metric, serfece, test_format)
+        board = self._boards.get(key)
+        if board is not None and time.monotonic() - board.loaded_at <= LEADERBOARD_CACHE_TTL:
+            return board
+        generation = self._generation
+        board = Board(metric)
+        # 削除直後の読み直しで、遅れているレプリカの古い自己ベストを固定しないようプライマリから読む
+        db.use_replica = False
+        rows = db.execute(
+            select(c.user_id, c.value, c.date)
+            .join(models.User, c.user_id == models.User.id)
+            .where(
+                grade_filter(key[0]),
+                c.metric == metric,
+                c.serfece == serfece,
+                c.test_format == test_format,
+            )
+        ).all()
+        board.load(rows)
+        with self._lock:
+            if generation == self._generation:
+                self._boards[key] = board
+        return board
+
+    def invalidate_grades(self, *grades: Optional[str]) -> None:
+        targets = {g or "" for g in grades}
+        with self._lock:
+            self._generation += 1
+            for key in [k for k in self._boards if k[0] in targets]:
+                del self._boards[key]
+
+    def on_results_added(self, rows: List[dict]) -> None:
+        with self._lock:
+            self._generation += 1
+            for row in rows:
+                grade = row["grade"] or ""
+                for s, t in _conditions(row):
+                    for metric in FITNESS_METRICS:
+                        board = self._boards.get((grade, metric, s, t))
+                        if board is not None and row.get(metric) is not None:
+                            board.offer(row["user_id"], float(row[metric]), row["date"])
+
+    def on_result_deleted(self, row: dict) -> None:
+        # 次点の自己ベストは DB にしか無いため、その学年のボードを読み直す
+        self.invalidate_grades(row["grade"])
+
+    def on_user_grade_changed(self, user_id, old_grade, new_grade) -> None:
+        self.invalidate_grades(old_grade, new_grade)
+
+
+leaderboards = Leaderboards()
+result_events.register(leaderboards)
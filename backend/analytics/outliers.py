@@ -0,0 +1,148 @@
+"""
+登録時の外れ値検出（7.2 秒を 72000 ms と入力した、などの入力ミス対策）
+
+新しい測定値を次の2つと比べ、どちらかで |z| が RESULT_OUTLIER_Z を超えたら
+疑わしい値とみなします。
+- 学年の分布: grade_metric_stats の平均・標準偏差（件数が
+  RESULT_OUTLIER_MIN_COHORT 未満の学年は判定しない）
+- 選手自身の履歴: 中央値と MAD による頑健な z（1.4826 × MAD を標準偏差とみなす）。
+  過去の結果が RESULT_OUTLIER_MIN_HISTORY 件未満なら判定しない。件数が少ないと
+  MAD が小さく出やすいため、中央値からの変化が RESULT_OUTLIER_MIN_CHANGE
+  （割合）以下なら疑わない
+
+学年の統計は全学年分をまとめてプロセス内にキャッシュし（TTL 付き、数件の
+追加では分布はほとんど変わらないため登録ごとには読み直さない。判定に足りる
+件数が無かった学年に結果が追加されたときだけ破棄する）、選手の履歴は
+登録する行の選手分を1クエリで読みます。1行あたりの判定は配列演算のみです。
+
+RESULT_OUTLIER_MODE:
+    flag  登録し、user_results.anomaly に理由を残す（既定）。その行は
+          POST /user_results/{id}/confirm で確認されるまで学年の集計・
+          パーセンタイル・リーダーボードなどに含めない
+    hold  登録せずにエラーとして返す
+    off   判定しない
+force=true で登録した行は確認済みとして扱い、anomaly を残さず集計に含めます。
+選手の履歴（中央値・MAD）にも確認前の行は使いません。
+"""
+import os
+from collections import defaultdict
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+from sqlalchemy import select
+
+from .. import models, result_events
+from ..cache import TTLCache
+from ..metrics import FITNESS_METRICS
+from .grade_stats import counted, stats_table, summary
+
+OUTLIER_MODE = os.getenv("RESULT_OUTLIER_MODE", "flag").lower()
+OUTLIER_Z = float(os.getenv("RESULT_OUTLIER_Z", "4"))
+OUTLIER_MIN_COHORT = int(os.getenv("RESULT_OUTLIER_MIN_COHORT", "20"))
+OUTLIER_MIN_HISTORY = int(os.getenv("RESULT_OUTLIER_MIN_HISTORY", "5"))
+OUTLIER_MIN_CHANGE = float(os.getenv("RESULT_OUTLIER_MIN_CHANGE", "0.5"))
+
+# MAD を正規分布の標準偏差に換算する係数
+_MAD_SCALE = 1.4826
+
+_cohort_cache = TTLCache(
+    max_size=1, ttl_seconds=float(os.getenv("RESULT_OUTLIER_STATS_TTL", "300"))
+)
+
+
+def enabled() -> bool:
+    return OUTLIER_MODE in ("flag", "hold")
+
+
+def cohort_stats(conn) -> Dict[Tuple[str, str], Tuple[int, float, float]]:
+    """(grade, metric) → (件数, 平均, 標準偏差)。全学年分をキャッシュから返す"""
+    stats = _cohort_cache.get("stats")
+    if stats is None:
+        stats = {}
+        for row in conn.execute(select(stats_table)).mappings():
+            s = summary(row)
+            if s["count"]:
+                stats[(row["grade"], row["metric"])] = (s["count"], s["mean"], s["stddev"])
+        _cohort_cache.set("stats", stats)
+    return stats
+
+
+class AthleteBaseline:
+    """選手ごとの種目別の中央値と頑健な標準偏差（1.4826 × MAD）"""
+
+    def __init__(self, values: np.ndarray) -> None:
+        self.count = len(values)
+        self.median = np.median(values, axis=0)
+        self.scale = _MAD_SCALE * np.median(np.abs(values - self.median), axis=0)
+
+
+def athlete_baselines(conn, user_ids: Iterable) -> Dict[object, AthleteBaseline]:
+    """選手の過去の結果を1クエリで読み、中央値と MAD を求める"""
+    user_ids = set(user_ids)
+    if not user_ids:
+        return {}
+    columns = [getattr(models.UserResult, m) for m in FITNESS_METRICS]
+    rows = conn.execute(
+        select(models.UserResult.user_id, *columns)
+        .where(models.UserResult.user_id.in_(user_ids), counted())
+    ).all()
+    history: Dict[object, list] = defaultdict(list)
+    for row in rows:
+        history[row[0]].append(row[1:])
+    return {
+        user_id: AthleteBaseline(np.asarray(values, dtype=np.float64))
+        for user_id, values in history.items()
+        if len(values) >= OUTLIER_MIN_HISTORY
+    }
+
+
+def check(
+    data: dict,
+    grade: Optional[str],
+    cohorts: Dict[Tuple[str, str], Tuple[int, float, float]],
+    baseline: Optional[AthleteBaseline],
+) -> Optional[str]:
+    """疑わしい種目があれば理由（"; " 区切り）を返す"""
+    reasons: List[str] = []
+    for j, metric in enumerate(FITNESS_METRICS):
+        value = data.get(metric)
+        if value is None:
+            continue
+        cohort = cohorts.get((grade or "", metric))
+        if cohort is not None and cohort[0] >= OUTLIER_MIN_COHORT and cohort[2] > 0:
+            z = (value - cohort[1]) / cohort[2]
+            if abs(z) > OUTLIER_Z:
+                reasons.append(f"{metric}={value:g} (grade z={z:.1f})")
+                continue
+        if baseline is not None and baseline.scale[j] > 0:
+            median = baseline.median[j]
+            z = (value - median) / baseline.scale[j]
+            if abs(z) > OUTLIER_Z and abs(value - median) > OUTLIER_MIN_CHANGE * abs(median):
+                reasons.append(
+                    f"{metric}={value:g} (athlete median {baseline.median[j]:g}, robust z={z:.1f})"
+                )
+    return "; ".join(reasons) or None
+
+
+class _CohortInvalidator:
+    """判定できる件数に達していない学年に結果が増えたら、学年の統計を読み直す"""
+
+    def on_results_added(self, rows) -> None:
+        stats = _cohort_cache.get("stats")
+        if stats is None:
+            return
+        for row in rows:
+            cohort = stats.get((row["grade"] or "", FITNESS_METRICS[0]))
+            if cohort is None or cohort[0] < OUTLIER_MIN_COHORT:
+                _cohort_cache.invalidate("stats")
+                return
+
+
+result_events.register(_CohortInvalidator())
+
+
+def check_rows(conn, rows: List[Tuple[dict, Optional[str]]]) -> List[Optional[str]]:
+    """(行, 学年) のリストを判定する（学年の統計はキャッシュ、履歴は1クエリ）"""
+    cohorts = cohort_stats(conn)
+    baselines = athlete_baselines(conn, (data["user_id"] for data, _ in rows))
+    return [check(data, grade, cohorts, baselines.get(data["user_id"])) for data, grade in rows]
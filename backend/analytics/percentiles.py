@@ -0,0 +1,172 @@
+"""
+学年コホート内のパーセンタイル
+
+学年 × 種目ごとに `user_results` の値を昇順の NumPy 配列で保持し、
+二分探索（np.searchsorted）で O(log n) にパーセンタイルを求めます。
+
+- 構築: 1クエリで全結果を取得し、lexsort で学年・値の順に並べて分割
+- 差分更新: 登録された値は保留バッファに積み、次の参照時にまとめてマージ
+  （一括登録でも1回のソートで済む）。削除は該当値を1つ取り除く
+- 学年変更など差分で追えない変更は、次の参照時に再構築する
+- 構築中にイベントが来たら（世代番号が変わったら）その構築結果は捨てて読み直す
+- 他ワーカーでの登録は差分に乗らないため、PERCENTILE_CACHE_TTL 秒ごとに再構築する
+
+パーセンタイルは「その値より成績が悪い人の割合 + 同値の半分」で、
+種目の向き（backend.metrics.LOWER_IS_BETTER）を考慮します。
+"""
+import os
+import threading
+import time
+import uuid
+from collections import defaultdict
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from .. import models, result_events
+from ..metrics import FITNESS_METRICS, higher_is_better
+from .grade_stats import counted
+
+PERCENTILE_CACHE_TTL = float(os.getenv("PERCENTILE_CACHE_TTL", "300"))
+# 構築中に書き込みが続いた場合に読み直す回数
+_BUILD_ATTEMPTS = 3
+
+_EMPTY = np.empty(0, dtype=np.float64)
+
+
+class CohortPercentiles:
+    """学年 × 種目の昇順配列を保持するパーセンタイルエンジン"""
+
+    def __init__(self) -> None:
+        self._lock = threading.RLock()
+        self._sorted: Dict[Tuple[str, str], np.ndarray] = {}
+        self._pending: Dict[Tuple[str, str], List[float]] = defaultdict(list)
+        self._built = False
+        self._built_at = 0.0
+        # 構築中に届いたイベントを取りこぼさないための世代番号（イベントごとに増やす）
+        self._generation = 0
+
+    # --- 構築 -------------------------------------------------------------
+
+    def _load(self, db: Session) -> Dict[Tuple[str, str], np.ndarray]:
+        columns = [getattr(models.UserResult, m) for m in FITNESS_METRICS]
+        rows = db.execute(
+            select(models.User.grade, *columns)
+            .join(models.User, models.UserResult.user_id == models.User.id)
+            .where(counted())
+        ).all()
+        arrays: Dict[Tuple[str, str], np.ndarray] = {}
+        if rows:
+            grades = np.array([row[0] or "" for row in rows], dtype=object)
+            values = np.array([row[1:] for row in rows], dtype=np.float64)
+            labels, codes = np.unique(grades, return_inverse=True)
+            counts = np.bincount(codes, minlength=len(labels))
+            bounds = np.cumsum(counts)[:-1]
+            for j, metric in enumerate(FITNESS_METRICS):
+                # 学年コード → 値 の順に並べ、学年ごとの境界で分割する
+                order = np.lexsort((values[:, j], codes))
+                for label, chunk in zip(labels, np.split(values[order, j], bounds)):
+                    arrays[(label, metric)] = chunk
+        return arrays
+
+    def build(self, db: Session) -> None:
+        """全結果を1クエリで読み込み、学年 × 種目の昇順配列を作り直す
+
+        クエリ中に結果の登録・削除があれば、その分が配列に含まれているか
+        分からないため、読み直す。
+        """
+        for _ in range(_BUILD_ATTEMPTS):
+            generation = self._generation
+            arrays = self._load(db)
+            with self._lock:
+                if generation == self._generation:
+                    self._sorted = arrays
+                    self._pending.clear()
+                    self._built = True
+                    self._built_at = time.monotonic()
+                    return
+        # 書き込みが続いている間は今回の配列で応答し、次の参照で作り直す
+        with self._lock:
+            self._sorted = arrays
+            self._pending.clear()
+            self._built = False
+
+    def ensure_built(self, db: Session) -> None:
+        if not self._built:
+            # 破棄直後の再構築は、遅れているレプリカではなくプライマリから読む
+            db.use_replica = False
+            self.build(db)
+        elif time.monotonic() - self._built_at > PERCENTILE_CACHE_TTL:
+            self.build(db)
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._generation += 1
+            self._built = False
+
+    # --- 差分更新（result_events のリスナー）----------------------------
+
+    def on_results_added(self, rows: List[dict]) -> None:
+        with self._lock:
+            self._generation += 1
+            if not self._built:
+                return
+            for row in rows:
+                for metric in FITNESS_METRICS:
+                    value = row.get(metric)
+                    if value is not None:
+                        self._pending[(row["grade"] or "", metric)].append(float(value))
+
+    def on_result_deleted(self, row: dict) -> None:
+        with self._lock:
+            self._generation += 1
+            if not self._built:
+                return
+            for metric in FITNESS_METRICS:
+                value = row.get(metric)
+                if value is None:
+                    continue
+                key = (row["grade"] or "", metric)
+                pending = self._pending.get(key)
+                if pending and float(value) in pending:
+                    pending.remove(float(value))
+                    continue
+                arr = self._sorted.get(key, _EMPTY)
+                i = int(np.searchsorted(arr, value, side="left"))
+                if i < len(arr) and arr[i] == value:
+                    self._sorted[key] = np.delete(arr, i)
+
+    def on_user_grade_changed(self, user_id: uuid.UUID, old_grade, new_grade) -> None:
+        # ユーザーの全結果がコホート間を移動するため、次回参照時に再構築する
+        self.invalidate()
+
+    # --- 参照 -------------------------------------------------------------
+
+    def cohort(self, grade: str, metric: str) -> np.ndarray:
+        """学年 × 種目の昇順配列（保留分をマージ済み）"""
+        key = (grade or "", metric)
+        with self._lock:
+            pending = self._pending.pop(key, None)
+            arr = self._sorted.get(key, _EMPTY)
+            if pending:
+                arr = np.sort(np.concatenate([arr, np.asarray(pending, dtype=np.float64)]))
+                self._sorted[key] = arr
+            return arr
+
+    def percentile(self, grade: str, metric: str, value: float) -> Tuple[Optional[float], int]:
+        """(パーセンタイル 0–100, コホート人数)。コホートが空なら (None, 0)"""
+        arr = self.cohort(grade, metric)
+        n = len(arr)
+        if n == 0:
+            return None, 0
+        below = int(np.searchsorted(arr, value, side="left"))
+        above = n - int(np.searchsorted(arr, value, side="right"))
+        ties = n - below - above
+        worse = below if higher_is_better(metric) else above
+        return round((worse + 0.5 * ties) / n * 100, 2), n
+
+
+cohort_percentiles = CohortPercentiles()
+result_events.register(cohort_percentiles)
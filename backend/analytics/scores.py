@@ -0,0 +1,213 @@
+"""
+測定結果のスコア
+
+正規化スコア（0–100）: 学年の最高記録を 100 とする
+- 大きいほど良い種目: 値 / 最高記録 × 100
+- 小さいほど良い種目（タイム）: 最高記録 / 値 × 100
+結果は 0–100 に丸め込みます。最高記録が無い・0 の種目は NaN（API では null）。
+
+T スコア: 学年コホートの平均・標準偏差で標準化した 50 + 10z（タイム系は
+符号を反転し、大きいほど良い）。合計スコアは5種目の T スコアの和です。
+学年ごとに全結果を1つの行列にして NumPy でまとめて計算し、
+`CohortScores` がプロセス内にキャッシュします（測定結果のイベントで
+その学年だけ破棄し、他ワーカーでの登録は SCORES_CACHE_TTL 秒で反映）。
+
+average_data / max_data の total_score（学年の合計スコアの平均・最高）は
+測定結果の登録・削除のたびに backend.analytics.grade_stats が更新します。
+次のコマンドは grade_metric_stats のある全学年について同じ処理
+（grade_stats.refresh_summaries）をまとめて実行します（復旧用）。
+測定結果の無い学年の行（手入力の参照値）は変更しません:
+    python -m backend.analytics.scores
+"""
+import os
+import threading
+import time
+import uuid
+from typing import Dict, List, Optional
+
+import numpy as np
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from .. import models, result_events
+from ..metrics import FITNESS_METRICS, higher_is_better
+from . import grade_stats
+from .grade_stats import counted, grade_filter
+
+SCORES_CACHE_TTL = float(os.getenv("SCORES_CACHE_TTL", "300"))
+
+_HIGHER = np.array([higher_is_better(m) for m in FITNESS_METRICS])
+
+
+def normalized_scores(values: np.ndarray, best: Dict[str, Optional[float]]) -> np.ndarray:
+    """values: (n, len(FITNESS_METRICS)) の測定値 → 同じ形のスコア（NaN あり）"""
+    values = np.asarray(values, dtype=np.float64).reshape(-1, len(FITNESS_METRICS))
+    ref = np.array(
+        [best.get(m) if best.get(m) else np.nan for m in FITNESS_METRICS], dtype=np.float64
+    )
+    with np.errstate(divide="ignore", invalid="ignore"):
+        scores = np.where(_HIGHER, values / ref, ref / values) * 100
+    scores[~np.isfinite(scores)] = np.nan
+    return np.clip(scores, 0, 100)
+
+
+def to_list(column: np.ndarray, ndigits: int = 1) -> List[Optional[float]]:
+    """NaN を None にして JSON 用のリストにする"""
+    return [None if np.isnan(v) else round(float(v), ndigits) for v in column]
+
+
+_DIRECTION = np.where(_HIGHER, 1.0, -1.0)
+
+
+def t_scores(values: np.ndarray) -> np.ndarray:
+    """(n, 種目) の測定値 → コホート内の T スコア（標準偏差 0 の種目は 50）"""
+    values = np.asarray(values, dtype=np.float64).reshape(-1, len(FITNESS_METRICS))
+    if len(values) == 0:
+        return values.copy()
+    mean = values.mean(axis=0)
+    std = values.std(axis=0)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        z = np.where(std > 0, (values - mean) / std, 0.0)
+    return 50 + 10 * z * _DIRECTION
+
+
+class GradeScores:
+    """1学年分の T スコア（result id の昇順）"""
+
+    def __init__(self, ids: np.ndarray, user_ids: np.ndarray, dates: np.ndarray, values: np.ndarray) -> None:
+        order = np.argsort(ids, kind="stable")
+        self.ids = ids[order]
+        self.user_ids = user_ids[order]
+        self.dates = dates[order]
+        self.t = t_scores(values[order])
+        self.total = self.t.sum(axis=1)
+        self.loaded_at = time.monotonic()
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    @property
+    def mean_total(self) -> Optional[float]:
+        return float(self.total.mean()) if len(self) else None
+
+    @property
+    def max_total(self) -> Optional[float]:
+        return float(self.total.max()) if len(self) else None
+
+    def for_user(self, user_id: uuid.UUID) -> np.ndarray:
+        """ユーザーの結果の位置（日付・id の昇順）"""
+        idx = np.flatnonzero(self.user_ids == user_id)
+        return idx[np.lexsort((self.ids[idx], self.dates[idx]))]
+
+
+def _load(db: Session, grade: Optional[str] = None):
+    columns = [getattr(models.UserResult, m) for m in FITNESS_METRICS]
+    stmt = select(
+        models.User.grade,
+        models.UserResult.id,
+        models.UserResult.user_id,
+        models.UserResult.date,
+        *columns,
+    ).join(models.User, models.UserResult.user_id == models.User.id).where(counted())
+    if grade is not None:
+        stmt = stmt.where(grade_filter(grade))
+    return db.execute(stmt).all()
+
+
+def _group(rows) -> Dict[str, GradeScores]:
+    if not rows:
+        return {}
+    grades = np.array([row[0] or "" for row in rows], dtype=object)
+    ids = np.array([row[1] for row in rows], dtype=np.int64)
+    user_ids = np.array([row[2] for row in rows], dtype=object)
+    dates = np.array([row[3] for row in rows], dtype="datetime64[D]")
+    values = np.array([row[4:] for row in rows], dtype=np.float64)
+    labels, codes = np.unique(grades, return_inverse=True)
+    return {
+        label: GradeScores(ids[mask], user_ids[mask], dates[mask], values[mask])
+        for label, mask in ((label, codes == k) for k, label in enumerate(labels))
+    }
+
+
+def _empty_scores() -> GradeScores:
+    return GradeScores(
+        np.empty(0, dtype=np.int64),
+        np.empty(0, dtype=object),
+        np.empty(0, dtype="datetime64[D]"),
+        np.empty((0, len(FITNESS_METRICS))),
+    )
+
+
+class CohortScores:
+    """学年ごとの T スコアのキャッシュ（測定結果のイベントで学年単位に破棄）"""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._grades: Dict[str, GradeScores] = {}
+        # 計算中に破棄された学年の古い結果を保存しないための世代番号
+        self._generation = 0
+
+    def for_grade(self, db: Session, grade: Optional[str]) -> GradeScores:
+        grade = grade or ""
+        scores = self._grades.get(grade)
+        if scores is None or time.monotonic() - scores.loaded_at > SCORES_CACHE_TTL:
+            generation = self._generation
+            # 破棄直後の読み込みは、遅れているレプリカではなくプライマリから読む
+            db.use_replica = False
+            scores = _group(_load(db, grade)).get(grade) or _empty_scores()
+            with self._lock:
+                if generation == self._generation:
+                    self._grades[grade] = scores
+        return scores
+
+    def score_all(self, db: Session) -> Dict[str, GradeScores]:
+        """全学年を1クエリで読み込んでまとめて計算し直す"""
+        generation = self._generation
+        grades = _group(_load(db))
+        with self._lock:
+            if generation == self._generation:
+                self._grades = dict(grades)
+        return grades
+
+    def invalidate(self, *grades: Optional[str]) -> None:
+        with self._lock:
+            self._generation += 1
+            for grade in grades:
+                self._grades.pop(grade or "", None)
+
+    def on_results_added(self, rows: List[dict]) -> None:
+        self.invalidate(*{row["grade"] for row in rows})
+
+    def on_result_deleted(self, row: dict) -> None:
+        self.invalidate(row["grade"])
+
+    def on_user_grade_changed(self, user_id, old_grade, new_grade) -> None:
+        self.invalidate(old_grade, new_grade)
+
+
+cohort_scores = CohortScores()
+result_events.register(cohort_scores)
+
+
+def persist_grade_totals(db: Session) -> List[str]:
+    """集計のある全学年の average_data / max_data（total_score を含む）を作り直す
+
+    登録・削除時と同じ grade_stats.refresh_summaries を使う。作り直した学年を返す。
+    """
+    grades = sorted(
+        grade for (grade,) in db.execute(select(grade_stats.c.grade).distinct()) if grade
+    )
+    grade_stats.refresh_summaries(db, grades)
+    db.commit()
+    return grades
+
+
+if __name__ == "__main__":
+    import time
+
+    from ..db import SessionLocal
+
+    start = time.perf_counter()
+    with SessionLocal() as session:
+        grades = persist_grade_totals(session)
+    print(f"Refreshed {len(grades)} grades in {time.perf_counter() - start:.2f}s")
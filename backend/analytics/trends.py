@@ -0,0 +1,103 @@
+"""
+選手ごとの記録の推移（回帰の傾き・直近の改善率・自己ベスト）
+
+学年全員の結果を (user_id, date, id) 順の1つの配列にし、選手ごとの区間を
+`np.add.reduceat` などでまとめて集計します。選手ごとのループやクエリはありません。
+
+- slope_per_year: 測定日（年単位）に対する最小二乗回帰の傾き（種目の単位/年）
+- improvement_pct: 直近 window 回の平均と、その前の window 回の平均の変化率（%）。
+  結果が 2×window 回に満たない選手は n // 2 回ずつで比較する。
+  タイム系は符号を反転し、どの種目でも正なら改善
+- personal_best: 自己ベスト（タイム系は最小値）とその測定日
+- trend: improvement_pct が ±plateau_pct 以内なら "plateau"、
+  それより大きければ "improving"、小さければ "declining"（比較できなければ None）
+"""
+from typing import Dict, Optional
+
+import numpy as np
+
+from ..metrics import FITNESS_METRICS, higher_is_better
+
+_DAYS_PER_YEAR = 365.25
+
+
+def _segment_sum(values: np.ndarray, starts: np.ndarray) -> np.ndarray:
+    return np.add.reduceat(values, starts, axis=0)
+
+
+def athlete_trends(
+    user_codes: np.ndarray,
+    dates: np.ndarray,
+    values: np.ndarray,
+    window: int = 3,
+) -> Dict[str, np.ndarray]:
+    """選手ごとの推移をまとめて計算する
+
+    user_codes: (n,) 選手の番号（同じ選手の行が連続し、各選手内は日付の昇順）
+    dates: (n,) datetime64[D]
+    values: (n, len(FITNESS_METRICS))
+    戻り値の各配列は選手数 m 行（種目ごとの値は (m, len(FITNESS_METRICS))）。
+    """
+    values = np.asarray(values, dtype=np.float64).reshape(-1, len(FITNESS_METRICS))
+    n_rows = len(values)
+    if n_rows == 0:
+        empty = np.empty((0, len(FITNESS_METRICS)))
+        return {
+            "starts": np.empty(0, dtype=np.int64), "counts": np.empty(0, dtype=np.int64),
+            "slope_per_year": empty, "improvement_pct": empty,
+            "personal_best": empty, "personal_best_index": empty.astype(np.int64),
+        }
+    starts = np.flatnonzero(np.r_[True, user_codes[1:] != user_codes[:-1]])
+    counts = np.diff(np.r_[starts, n_rows])
+    ends = starts + counts
+    group = np.repeat(np.arange(len(starts)), counts)
+    direction = np.array([1.0 if higher_is_better(m) else -1.0 for m in FITNESS_METRICS])
+
+    # 回帰の傾き: 選手ごとに x（年）を中心化して Σ(x - x̄)(y - ȳ) / Σ(x - x̄)²
+    x = (dates - dates[starts][group]).astype(np.float64) / _DAYS_PER_YEAR
+    x_mean = _segment_sum(x, starts) / counts
+    xc = x - x_mean[group]
+    y_mean = _segment_sum(values, starts) / counts[:, None]
+    yc = values - y_mean[group]
+    sxx = _segment_sum(xc * xc, starts)
+    sxy = _segment_sum(xc[:, None] * yc, starts)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        slope = np.where(sxx[:, None] > 0, sxy / sxx[:, None], np.nan)
+
+    # 直近 window 回とその前 window 回の平均（累積和の差で区間和を取る）
+    k = np.minimum(window, counts // 2)
+    cumsum = np.vstack([np.zeros((1, values.shape[1])), np.cumsum(values, axis=0)])
+    safe_k = np.maximum(k, 1)[:, None]
+    recent = (cumsum[ends] - cumsum[ends - k]) / safe_k
+    previous = (cumsum[ends - k] - cumsum[ends - 2 * k]) / safe_k
+    with np.errstate(divide="ignore", invalid="ignore"):
+        improvement = (recent - previous) / np.abs(previous) * 100 * direction
+    improvement[k == 0] = np.nan
+    improvement[~np.isfinite(improvement)] = np.nan
+
+    # 自己ベスト: (選手, 良さ) で並べて各選手の末尾を取る（同値は古い方）
+    best_index = np.empty((len(starts), values.shape[1]), dtype=np.int64)
+    row_index = np.arange(n_rows)
+    for j in range(values.shape[1]):
+        order = np.lexsort((-row_index, values[:, j] * direction[j], group))
+        best_index[:, j] = order[ends - 1]
+    personal_best = np.take_along_axis(values, best_index, axis=0)
+
+    return {
+        "starts": starts,
+        "counts": counts,
+        "slope_per_year": slope,
+        "improvement_pct": improvement,
+        "personal_best": personal_best,
+        "personal_best_index": best_index,
+    }
+
+
+def classify(improvement_pct: float, plateau_pct: float) -> Optional[str]:
+    if np.isnan(improvement_pct):
+        return None
+    if improvement_pct > plateau_pct:
+        return "improving"
+    if improvement_pct < -plateau_pct:
+        return "declining"
+    return "plateau"
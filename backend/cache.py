@@ -0,0 +1,102 @@
+"""
+プロセス内キャッシュ
+
+ワーカープロセスごとに保持する、件数上限と TTL 付きのキャッシュです。
+複数ワーカー間では共有されないため、更新系エンドポイントで明示的に
+`invalidate()` し、TTL を短めにして他ワーカーの古い値を自然に失効させます。
+"""
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Hashable, Optional
+
+from starlette.requests import Request
+from starlette.responses import Response
+
+
+class TTLCache:
+    """件数上限（LRU）と TTL 付きのスレッドセーフなキャッシュ"""
+
+    def __init__(self, max_size: int = 1024, ttl_seconds: float = 60) -> None:
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        self._items: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        # invalidate() / clear() のたびに増える世代番号（set_if_current 用）
+        self._generation = 0
+
+    @property
+    def generation(self) -> int:
+        return self._generation
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        with self._lock:
+            item = self._items.get(key)
+            if item is None:
+                return None
+            value, expires_at = item
+            if expires_at <= time.monotonic():
+                del self._items[key]
+                return None
+            self._items.move_to_end(key)
+            return value
+
+    def set(self, key: Hashable, value: Any) -> None:
+        with self._lock:
+            self._set(key, value)
+
+    def _set(self, key: Hashable, value: Any) -> None:
+        self._items[key] = (value, time.monotonic() + self.ttl_seconds)
+        self._items.move_to_end(key)
+        while len(self._items) > self.max_size:
+            self._items.popitem(last=False)
+
+    def set_if_current(self, key: Hashable, value: Any, generation: int) -> bool:
+        """読み込み開始時の generation 以降に破棄されていなければ保存する
+
+        読み込み中の更新で破棄された古い値を、TTL の間保持し続けないために使う。
+        """
+        with self._lock:
+            if generation != self._generation:
+                return False
+            self._set(key, value)
+            return True
+
+    def invalidate(self, key: Hashable) -> None:
+        with self._lock:
+            self._generation += 1
+            self._items.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._generation += 1
+            self._items.clear()
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+
+def make_etag(body: bytes) -> str:
+    """レスポンス本文から強い ETag を作る"""
+    return '"' + hashlib.sha256(body).hexdigest()[:32] + '"'
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    """If-None-Match が etag に一致するか（一致すれば 304 を返してよい）"""
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    candidates = [t.strip() for t in header.split(",")]
+    # 弱い比較（W/ 付きも一致とみなす）
+    return any(t == etag or t == "W/" + etag for t in candidates)
+
+
+def conditional_response(request: Request, body: bytes, etag: str) -> Response:
+    """レンダリング済みの JSON を ETag 付きで返す（If-None-Match が一致すれば 304）"""
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if etag_matches(request, etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
@@ -1,9 +1,15 @@
 import os
 import datetime
+import itertools
+import threading
+import time
 from pathlib import Path
 from dotenv import load_dotenv
-from sqlalchemy import create_engine, text
-from sqlalchemy.orm import declarative_base, sessionmaker
+from sqlalchemy import create_engine, event
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.orm import Session, declarative_base, sessionmaker
+from sqlalchemy.sql.dml import UpdateBase
+from .pool import InstrumentedAsyncQueuePool, InstrumentedQueuePool
 
 # Load environment variables from .env file
 env_path = Path(__file__).parent.parent / ".env"
@@ -12,107 +18,194 @@ load_dotenv(dotenv_path=env_path)
 # Use environment variable first; fall back to local SQLite for development
 DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./backend/test.db")
 
+
+def _env_int(name: str, default: int) -> int:
+    value = os.getenv(name)
+    return int(value) if value not in (None, "") else default
+
+
+def _env_bool(name: str, default: bool) -> bool:
+    value = os.getenv(name)
+    if value in (None, ""):
+        return default
+    return value.lower() in ("1", "true", "yes", "on")
+
+
+def _is_memory_sqlite(url: str) -> bool:
+    return url.startswith("sqlite") and (
+        ":memory:" in url or url.rstrip("/") in ("sqlite:", "sqlite://")
+    )
+
+
+def _pool_kwargs(url: str, poolclass=InstrumentedQueuePool) -> dict:
+    """Pool settings driven by DB_POOL_* environment variables.
+
+    In-memory SQLite keeps SQLAlchemy's default SingletonThreadPool, since a
+    queue of separate connections would each see an empty database.
+    """
+    if _is_memory_sqlite(url):
+        return {}
+    return {
+        "poolclass": poolclass,
+        "pool_size": _env_int("DB_POOL_SIZE", 5),
+        "max_overflow": _env_int("DB_MAX_OVERFLOW", 10),
+        "pool_timeout": _env_int("DB_POOL_TIMEOUT", 30),
+        "pool_recycle": _env_int("DB_POOL_RECYCLE", 1800),
+        "pool_pre_ping": _env_bool("DB_POOL_PRE_PING", True),
+    }
+
+
+def sqlite_pragmas() -> list:
+    """PRAGMAs of the opt-in SQLite performance profile (SQLITE_* env vars).
+
+    WAL lets readers proceed while a writer commits; synchronous=NORMAL is
+    durable across application crashes in WAL mode and only risks the last
+    transactions on power loss.
+    """
+    return [
+        "PRAGMA journal_mode=WAL",
+        "PRAGMA synchronous=NORMAL",
+        f"PRAGMA mmap_size={_env_int('SQLITE_MMAP_SIZE', 268435456)}",
+        # Negative values are KiB rather than pages
+        f"PRAGMA cache_size={_env_int('SQLITE_CACHE_SIZE', -65536)}",
+        "PRAGMA temp_store=MEMORY",
+        f"PRAGMA busy_timeout={_env_int('SQLITE_BUSY_TIMEOUT_MS', 5000)}",
+    ]
+
+
+def apply_sqlite_pragmas(dbapi_connection, connection_record) -> None:
+    """`connect` event listener: run the profile PRAGMAs on each new connection."""
+    cursor = dbapi_connection.cursor()
+    try:
+        for pragma in sqlite_pragmas():
+            cursor.execute(pragma)
+    finally:
+        cursor.close()
+
+
+SQLITE_PERFORMANCE_PROFILE = _env_bool("SQLITE_PERFORMANCE_PROFILE", False)
+
 engine = create_engine(
     DATABASE_URL,
     connect_args={"check_same_thread": False} if DATABASE_URL.startswith(
         "sqlite") else {},
+    **_pool_kwargs(DATABASE_URL),
 )
 
+if DATABASE_URL.startswith("sqlite") and SQLITE_PERFORMANCE_PROFILE:
+    event.listen(engine, "connect", apply_sqlite_pragmas)
+
+# Optional read replicas: comma-separated URLs. Without them every session
+# talks to the primary exactly as before.
+DATABASE_REPLICA_URLS = [
+    url.strip() for url in os.getenv("DATABASE_REPLICA_URLS", "").split(",")
+    if url.strip()
+]
+# Reads from a client that wrote within this window stay on the primary
+REPLICA_STICKY_SECONDS = float(os.getenv("DATABASE_REPLICA_STICKY_SECONDS", "5"))
+
+replica_engines = [
+    create_engine(
+        url,
+        connect_args={"check_same_thread": False} if url.startswith(
+            "sqlite") else {},
+        **_pool_kwargs(url),
+    )
+    for url in DATABASE_REPLICA_URLS
+]
+_replica_cycle = itertools.cycle(replica_engines) if replica_engines else None
+
+
+class RoutingSession(Session):
+    """Session that sends reads to a replica when `use_replica` is set.
+
+    Flushes and INSERT/UPDATE/DELETE statements always go to the primary,
+    and `wrote` records that this session issued a write. A session picks
+    one replica on its first replica read and keeps it, so all reads of a
+    request see the same replica snapshot.
+    """
+
+    use_replica = False
+    wrote = False
+    _replica = None
+
+    def get_bind(self, mapper=None, clause=None, **kw):
+        if self._flushing or isinstance(clause, UpdateBase):
+            self.wrote = True
+            return engine
+        if self.use_replica and _replica_cycle is not None:
+            if self._replica is None:
+                self._replica = next(_replica_cycle)
+            return self._replica
+        return engine
+
+
+class RecentWriters:
+    """Clients that wrote recently, for read-your-writes stickiness."""
+
+    def __init__(self, window_seconds: float) -> None:
+        self.window_seconds = window_seconds
+        self._lock = threading.Lock()
+        self._expires = {}
+
+    def mark(self, key: str) -> None:
+        now = time.monotonic()
+        with self._lock:
+            self._expires[key] = now + self.window_seconds
+            if len(self._expires) > 10000:
+                self._expires = {
+                    k: v for k, v in self._expires.items() if v > now}
+
+    def is_sticky(self, key: str) -> bool:
+        expires = self._expires.get(key)
+        return expires is not None and expires > time.monotonic()
+
+
+recent_writers = RecentWriters(REPLICA_STICKY_SECONDS)
+
 SessionLocal = sessionmaker(
-    autocommit=False, autoflush=False, bind=engine
+    class_=RoutingSession, autocommit=False, autoflush=False, bind=engine
+)
+
+
+def _async_url(url: str) -> str:
+    """Map the sync DATABASE_URL onto its async driver (aiosqlite / psycopg)."""
+    scheme, sep, rest = url.partition("://")
+    dialect = scheme.split("+", 1)[0]
+    if dialect == "sqlite":
+        return f"sqlite+aiosqlite{sep}{rest}"
+    if dialect in ("postgresql", "postgres"):
+        return f"postgresql+psycopg{sep}{rest}"
+    return url
+
+
+ASYNC_DATABASE_URL = os.getenv("ASYNC_DATABASE_URL", _async_url(DATABASE_URL))
+
+async_engine = create_async_engine(
+    ASYNC_DATABASE_URL,
+    **_pool_kwargs(ASYNC_DATABASE_URL, poolclass=InstrumentedAsyncQueuePool),
+)
+
+if ASYNC_DATABASE_URL.startswith("sqlite") and SQLITE_PERFORMANCE_PROFILE:
+    event.listen(async_engine.sync_engine, "connect", apply_sqlite_pragmas)
+
+# expire_on_commit=False: 非同期では commit 後の属性アクセスで暗黙の再読込ができないため
+AsyncSessionLocal = async_sessionmaker(
+    bind=async_engine, autoflush=False, expire_on_commit=False
 )
 
 Base = declarative_base()
 
 
 def ensure_schema() -> None:
-    from . import models  # noqa: F401 - ensure models are imported
-
-    # Migration logic for both SQLite and PostgreSQL
-    is_sqlite = DATABASE_URL.startswith("sqlite")
-    is_postgres = DATABASE_URL.startswith("postgresql")
-
-    # Enumの値が数値のため、PostgreSQLのEnum型作成は不要
-    # Integer型のカラムとして保存される
-
-    # Create tables
-    Base.metadata.create_all(bind=engine)
-
-    with engine.connect() as conn:
-        if is_sqlite:
-            # SQLite: Check and add firebase_uid to users table
-            res = conn.execute(text("PRAGMA table_info(users)"))
-            cols = [row[1] for row in res.fetchall()]
-            if "firebase_uid" not in cols:
-                conn.execute(
-                    text("ALTER TABLE users ADD COLUMN firebase_uid TEXT"))
-                conn.execute(text(
-                    "CREATE UNIQUE INDEX IF NOT EXISTS idx_users_firebase_uid ON users(firebase_uid)"))
-
-            # Check and add birthday to users table
-            if "birthday" not in cols:
-                conn.execute(
-                    text("ALTER TABLE users ADD COLUMN birthday DATE"))
-
-            # Check and add new columns to user_results table
-            res = conn.execute(text("PRAGMA table_info(user_results)"))
-            result_cols = [row[1] for row in res.fetchall()]
-
-            if "25m_run" not in result_cols:
-                conn.execute(
-                    text("ALTER TABLE user_results ADD COLUMN \"25m_run\" INTEGER"))
-
-            if "serfece" not in result_cols:
-                conn.execute(
-                    text("ALTER TABLE user_results ADD COLUMN serfece INTEGER"))
-
-            if "test_format" not in result_cols:
-                conn.execute(
-                    text("ALTER TABLE user_results ADD COLUMN test_format INTEGER"))
-
-            conn.commit()
-
-        elif is_postgres:
-            # PostgreSQL: Check and add columns using information_schema
-            # Check users table columns
-            res = conn.execute(text("""
-                SELECT column_name 
-                FROM information_schema.columns 
-                WHERE table_name = 'users' AND table_schema = 'public'
-            """))
-            cols = [row[0] for row in res.fetchall()]
-
-            if "firebase_uid" not in cols:
-                conn.execute(
-                    text("ALTER TABLE users ADD COLUMN firebase_uid VARCHAR(255)"))
-                conn.execute(text(
-                    "CREATE UNIQUE INDEX IF NOT EXISTS idx_users_firebase_uid ON users(firebase_uid)"))
-
-            if "birthday" not in cols:
-                conn.execute(
-                    text("ALTER TABLE users ADD COLUMN birthday DATE"))
-
-            # Check user_results table columns
-            res = conn.execute(text("""
-                SELECT column_name 
-                FROM information_schema.columns 
-                WHERE table_name = 'user_results' AND table_schema = 'public'
-            """))
-            result_cols = [row[0] for row in res.fetchall()]
-
-            if "25m_run" not in result_cols:
-                conn.execute(
-                    text('ALTER TABLE user_results ADD COLUMN "25m_run" INTEGER'))
-
-            if "serfece" not in result_cols:
-                conn.execute(
-                    text("ALTER TABLE user_results ADD COLUMN serfece INTEGER"))
-
-            if "test_format" not in result_cols:
-                conn.execute(
-                    text("ALTER TABLE user_results ADD COLUMN test_format INTEGER"))
-
-            conn.commit()
+    """Bring the schema up to date via the versioned migration ledger.
+
+    When the schema is current this is a single version lookup; pending
+    migrations run once under a lock (see backend/migrations.py).
+    """
+    from .migrations import run_migrations
+
+    run_migrations(engine)
 
 
 def get_db():
@@ -121,3 +214,8 @@ def get_db():
         yield db
     finally:
         db.close()
+
+
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
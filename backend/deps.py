@@ -2,16 +2,48 @@ import base64
 import json
 import os
 from typing import Optional
-from fastapi import Request, Depends
-from sqlalchemy.orm import Session
-from .db import SessionLocal
+from fastapi import HTTPException, Request, Depends
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, selectinload
+from sqlalchemy.orm.attributes import set_committed_value
+from . import models
+from .cache import TTLCache
+from .db import SessionLocal, recent_writers, replica_engines
+from .db import get_async_db  # noqa: F401 - routers はここから import する
+from .firebase_auth import InvalidTokenError, verified_tokens, verify_firebase_token
+from .schemas import UserProfile
 
+READ_ONLY_METHODS = ("GET", "HEAD")
 
-def get_db():
+
+def _client_key(request: Request) -> str:
+    """Identify the caller for read-your-writes stickiness (uid, else client IP)."""
+    authz = request.headers.get("authorization") or ""
+    if authz.lower().startswith("bearer "):
+        sub = _decode_jwt_no_verify(authz.split(" ", 1)[1]).get("sub")
+        if sub:
+            return f"uid:{sub}"
+    return f"ip:{request.client.host if request.client else ''}"
+
+
+def get_db(request: Request):
     db = SessionLocal()
+    key = None
+    if replica_engines:
+        # GET/HEAD go to a replica unless this client wrote in the last few seconds
+        key = _client_key(request)
+        db.use_replica = (
+            request.method in READ_ONLY_METHODS and not recent_writers.is_sticky(key)
+        )
     try:
         yield db
     finally:
+        if key is not None and (db.wrote or request.method not in READ_ONLY_METHODS):
+            recent_writers.mark(key)
         db.close()
 
 
@@ -36,7 +68,65 @@ async def get_current_firebase_uid(request: Request) -> Optional[str]:
     if not verify:
         payload = _decode_jwt_no_verify(token)
         return payload.get("sub")
-    # TODO: firebase-admin で厳密検証
-    return None
+    # 検証済みキャッシュに当たれば署名検証を省略。外れた場合は鍵の取得が
+    # 発生しうるため、イベントループを塞がないようスレッドで検証する
+    claims = verified_tokens.get(token)
+    if claims is None:
+        try:
+            claims = await run_in_threadpool(verify_firebase_token, token)
+        except InvalidTokenError:
+            return None
+    return claims.get("sub")
+
+
+# firebase_uid → UserProfile。update_user で無効化し、他ワーカー分は TTL で失効
+user_identity_cache = TTLCache(
+    max_size=int(os.getenv("USER_IDENTITY_CACHE_SIZE", "10000")),
+    ttl_seconds=float(os.getenv("USER_IDENTITY_CACHE_TTL", "300")),
+)
+
+
+async def get_or_create_user(db: AsyncSession, uid: str, with_results: bool = False):
+    """firebase_uid に対応するユーザーを取得（初回ログイン時は作成）
+
+    既存ユーザーは SELECT 1回。未登録なら INSERT ... ON CONFLICT DO NOTHING
+    RETURNING で作成し、同じ uid の同時リクエストが一意制約で 500 になる
+    ことを防ぐ（競合に負けた側は RETURNING が空なので再 SELECT する）。
+    """
+    stmt = select(models.User).filter(models.User.firebase_uid == uid)
+    if with_results:
+        stmt = stmt.options(selectinload(models.User.results))
+    user = (await db.execute(stmt)).scalars().first()
+    if user is None:
+        dialect_insert = (
+            pg_insert if db.bind.dialect.name == "postgresql" else sqlite_insert
+        )
+        insert_stmt = (
+            dialect_insert(models.User)
+            .values(name="User", grade="", firebase_uid=uid)
+            .on_conflict_do_nothing(index_elements=[models.User.firebase_uid])
+            .returning(models.User)
+        )
+        user = (await db.scalars(insert_stmt)).first()
+        await db.commit()
+        if user is None:
+            user = (await db.execute(stmt)).scalars().first()
+        else:
+            # 作成直後なので results は空。遅延ロードさせないよう値を確定させる
+            set_committed_value(user, "results", [])
+    user_identity_cache.set(uid, UserProfile.model_validate(user))
+    return user
 
 
+async def get_current_user_profile(
+    request: Request, db: AsyncSession = Depends(get_async_db)
+) -> UserProfile:
+    """認証済みユーザーのプロフィール（キャッシュに当たればDBアクセスなし）"""
+    uid = await get_current_firebase_uid(request)
+    if not uid:
+        raise HTTPException(status_code=401, detail="Unauthorized")
+    profile = user_identity_cache.get(uid)
+    if profile is None:
+        user = await get_or_create_user(db, uid)
+        profile = UserProfile.model_validate(user)
+    return profile
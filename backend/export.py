@@ -0,0 +1,287 @@
+"""
+測定結果・トレーニング記録のエクスポート（CSV / Parquet / Arrow IPC）
+
+サーバーサイドカーソル（stream_results + yield_per）で固定件数ずつ読み、
+バッチごとに書き出します。テーブルの大きさに関わらずメモリ使用量は
+バッチ1つ分で一定です。読み込みはリードレプリカがあればそちらを使います。
+
+データセット:
+    user_results                測定結果（date で絞り込み）
+    user_training_results       トレーニング実施結果（date で絞り込み）
+    training_feedback_messages  フィードバックメッセージ（created_at の日付で絞り込み）
+
+いずれも選手の学年（users.grade）でも絞り込めます。Parquet / Arrow には
+pyarrow が必要です（CSV は標準ライブラリのみ）。
+
+使用方法:
+    python -m backend.export user_results --format parquet -o results.parquet \\
+        --from 2024-04-01 --to 2025-03-31 --grade 3
+HTTP:
+    GET /exports/{dataset}?format=csv|parquet|arrow&from=&to=&grade=
+"""
+import csv
+import datetime
+import io
+import os
+from typing import Dict, Iterator, List, Optional, Sequence
+
+from sqlalchemy import Date, DateTime, Float, Integer, select
+from sqlalchemy.sql import Select
+
+from . import models
+from .analytics.grade_stats import grade_filter
+from .db import SessionLocal
+
+EXPORT_BATCH_SIZE = int(os.getenv("EXPORT_BATCH_SIZE", "5000"))
+
+FORMATS = {
+    "csv": ("text/csv; charset=utf-8", "csv"),
+    "parquet": ("application/vnd.apache.parquet", "parquet"),
+    "arrow": ("application/vnd.apache.arrow.stream", "arrow"),
+}
+
+
+class ExportError(ValueError):
+    """未知のデータセット・形式、または pyarrow が無い"""
+
+
+def _user_results() -> Select:
+    r = models.UserResult
+    return (
+        select(
+            r.id, r.user_id, models.User.grade, r.date,
+            r.long_jump_cm, r.fifty_meter_run_ms, r.spider_ms,
+            r.eight_shape_run_count, r.ball_throw_cm,
+            r._25m_run.label("25m_run"), r.serfece, r.test_format, r.anomaly,
+        )
+        .join(models.User, r.user_id == models.User.id)
+        .order_by(r.id)
+    )
+
+
+def _user_training_results() -> Select:
+    r = models.UserTrainingResult
+    return (
+        select(
+            r.id, r.user_id, models.User.grade, r.training_id,
+            models.Training.training_type, models.Training.title,
+            r.date, r.achievement_level, r.comment, r.created_at, r.updated_at,
+        )
+        .join(models.User, r.user_id == models.User.id)
+        .join(models.Training, r.training_id == models.Training.id)
+        .order_by(r.id)
+    )
+
+
+def _training_feedback_messages() -> Select:
+    m = models.TrainingFeedbackMessage
+    r = models.UserTrainingResult
+    return (
+        select(
+            m.id, m.user_training_result_id, r.user_id, models.User.grade,
+            r.training_id, m.sender_type, m.sender_id, m.message, m.message_type,
+            m.created_at, m.read_at,
+        )
+        .join(r, m.user_training_result_id == r.id)
+        .join(models.User, r.user_id == models.User.id)
+        .order_by(m.id)
+    )
+
+
+# データセット名 → (SELECT, 日付で絞り込む列（Date または DateTime）)
+DATASETS: Dict[str, tuple] = {
+    "user_results": (_user_results, lambda: models.UserResult.date),
+    "user_training_results": (_user_training_results, lambda: models.UserTrainingResult.date),
+    "training_feedback_messages": (
+        _training_feedback_messages,
+        lambda: models.TrainingFeedbackMessage.created_at,
+    ),
+}
+
+
+def build_query(
+    dataset: str,
+    date_from: Optional[datetime.date] = None,
+    date_to: Optional[datetime.date] = None,
+    grade: Optional[str] = None,
+) -> Select:
+    if dataset not in DATASETS:
+        raise ExportError(f"Unknown dataset: {dataset}. Valid values: {list(DATASETS)}")
+    build, date_column = DATASETS[dataset]
+    stmt = build()
+    column = date_column()
+    if isinstance(column.type, DateTime):
+        # CAST(... AS DATE) は SQLite では数値になるため、[from の0時, to の翌日0時) で比べる
+        if date_from is not None:
+            stmt = stmt.where(column >= datetime.datetime.combine(date_from, datetime.time.min))
+        if date_to is not None:
+            next_day = date_to + datetime.timedelta(days=1)
+            stmt = stmt.where(column < datetime.datetime.combine(next_day, datetime.time.min))
+    else:
+        if date_from is not None:
+            stmt = stmt.where(column >= date_from)
+        if date_to is not None:
+            stmt = stmt.where(column <= date_to)
+    if grade is not None:
+        stmt = stmt.where(grade_filter(grade))
+    return stmt
+
+
+def _arrow_schema(stmt: Select):
+    import pyarrow as pa
+
+    fields = []
+    for column in stmt.selected_columns:
+        sql_type = column.type
+        if isinstance(sql_type, Integer):
+            arrow_type = pa.int64()
+        elif isinstance(sql_type, Float):
+            arrow_type = pa.float64()
+        elif isinstance(sql_type, DateTime):
+            arrow_type = pa.timestamp("us")
+        elif isinstance(sql_type, Date):
+            arrow_type = pa.date32()
+        else:  # String / Text / GUID
+            arrow_type = pa.string()
+        fields.append(pa.field(column.name, arrow_type))
+    return pa.schema(fields)
+
+
+def _cell(value):
+    # GUID（uuid.UUID）は文字列で出力する
+    if value is None or isinstance(value, (int, float, str, datetime.date)):
+        return value
+    return str(value)
+
+
+def _batches(stmt: Select, batch_size: int) -> Iterator[List[Sequence]]:
+    with SessionLocal() as session:
+        session.use_replica = True
+        result = session.execute(
+            stmt, execution_options={"stream_results": True, "yield_per": batch_size}
+        )
+        for partition in result.partitions():
+            yield [[_cell(v) for v in row] for row in partition]
+
+
+class _ChunkSink(io.RawIOBase):
+    """pyarrow の書き込み先。書かれたバイト列を溜め、drain() で取り出す"""
+
+    def __init__(self) -> None:
+        self._chunks: List[bytes] = []
+        self._position = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        data = bytes(data)
+        self._chunks.append(data)
+        self._position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._position
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def _csv_chunks(stmt: Select, batch_size: int) -> Iterator[bytes]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow([column.name for column in stmt.selected_columns])
+    for batch in _batches(stmt, batch_size):
+        writer.writerows(batch)
+        yield buffer.getvalue().encode("utf-8")
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode("utf-8")
+
+
+def _arrow_chunks(stmt: Select, batch_size: int, fmt: str) -> Iterator[bytes]:
+    import pyarrow as pa
+
+    schema = _arrow_schema(stmt)
+    sink = _ChunkSink()
+    if fmt == "parquet":
+        import pyarrow.parquet as pq
+
+        writer = pq.ParquetWriter(sink, schema)
+        write = writer.write_table
+    else:
+        writer = pa.ipc.new_stream(sink, schema)
+        write = writer.write_batch
+    try:
+        for batch in _batches(stmt, batch_size):
+            columns = list(zip(*batch))
+            arrays = [pa.array(col, type=field.type) for col, field in zip(columns, schema)]
+            record_batch = pa.RecordBatch.from_arrays(arrays, schema=schema)
+            write(pa.Table.from_batches([record_batch]) if fmt == "parquet" else record_batch)
+            # 1バッチ = Parquet の1行グループ / Arrow の1レコードバッチ
+            chunk = sink.drain()
+            if chunk:
+                yield chunk
+    finally:
+        writer.close()
+    chunk = sink.drain()
+    if chunk:
+        yield chunk
+
+
+def check_format(fmt: str) -> None:
+    if fmt not in FORMATS:
+        raise ExportError(f"Unknown format: {fmt}. Valid values: {list(FORMATS)}")
+    if fmt != "csv":
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError:
+            raise ExportError(f"{fmt} export requires pyarrow")
+
+
+def export_chunks(stmt: Select, fmt: str, batch_size: int = EXPORT_BATCH_SIZE) -> Iterator[bytes]:
+    """エクスポートの本文をバッチ単位のバイト列で返すジェネレータ"""
+    check_format(fmt)
+    if fmt == "csv":
+        return _csv_chunks(stmt, batch_size)
+    return _arrow_chunks(stmt, batch_size, fmt)
+
+
+def _main(argv: Optional[Sequence[str]] = None) -> None:
+    import argparse
+    import sys
+    import time
+
+    parser = argparse.ArgumentParser(prog="python -m backend.export", description=__doc__.split("\n")[1])
+    parser.add_argument("dataset", choices=list(DATASETS))
+    parser.add_argument("--format", default="csv", choices=list(FORMATS))
+    parser.add_argument("-o", "--output", help="出力ファイル（省略時は標準出力）")
+    parser.add_argument("--from", dest="date_from", type=datetime.date.fromisoformat)
+    parser.add_argument("--to", dest="date_to", type=datetime.date.fromisoformat)
+    parser.add_argument("--grade")
+    parser.add_argument("--batch-size", type=int, default=EXPORT_BATCH_SIZE)
+    args = parser.parse_args(argv)
+
+    stmt = build_query(args.dataset, args.date_from, args.date_to, args.grade)
+    start = time.perf_counter()
+    written = 0
+    out = open(args.output, "wb") if args.output else sys.stdout.buffer
+    try:
+        for chunk in export_chunks(stmt, args.format, args.batch_size):
+            out.write(chunk)
+            written += len(chunk)
+    finally:
+        if args.output:
+            out.close()
+    print(
+        f"Exported {args.dataset} ({args.format}, {written} bytes) "
+        f"in {time.perf_counter() - start:.2f}s",
+        file=sys.stderr,
+    )
+
+
+if __name__ == "__main__":
+    _main()
@@ -0,0 +1,64 @@
+"""
+ユーザー系エンドポイントのスパースフィールドセット
+
+`fields=` で返す項目を、`include=` で含めるリレーションを指定します。
+
+    GET /users/{id}?fields=name,grade          → {"name": ..., "grade": ...}
+    GET /users/{id}?fields=id,name&include=results
+
+どちらも指定しない場合は従来どおり results を含む UserRead 全体を返します。
+指定した場合、要求されていないリレーションは読み込みもシリアライズもしません。
+"""
+from typing import Optional, Set
+
+from fastapi import HTTPException, Query
+
+from .schemas import UserProfile, UserResultRead
+
+USER_FIELDS = tuple(UserProfile.model_fields)
+USER_RELATIONS = ("results",)
+
+
+def _split(value: Optional[str]) -> Set[str]:
+    return {part.strip() for part in (value or "").split(",") if part.strip()}
+
+
+class UserFieldset:
+    """リクエストで要求されたフィールドとリレーション"""
+
+    def __init__(self, fields: Set[str], include: Set[str]) -> None:
+        self.fields = fields
+        self.include = include
+
+    @property
+    def wants_results(self) -> bool:
+        return "results" in self.include
+
+    def serialize(self, user) -> dict:
+        data = UserProfile.model_validate(user).model_dump(mode="json", include=self.fields)
+        if self.wants_results:
+            data["results"] = [
+                UserResultRead.model_validate(r).model_dump(mode="json") for r in user.results
+            ]
+        return data
+
+
+def user_fieldset(
+    fields: Optional[str] = Query(None, description=f"返す項目（{', '.join(USER_FIELDS)}）"),
+    include: Optional[str] = Query(None, description="含めるリレーション（results）"),
+) -> Optional[UserFieldset]:
+    """fields / include のどちらも無ければ None（従来のレスポンス）"""
+    if fields is None and include is None:
+        return None
+    requested = _split(fields)
+    relations = _split(include)
+    # fields=results のようにリレーションを fields 側で指定しても受け付ける
+    relations |= requested & set(USER_RELATIONS)
+    requested -= set(USER_RELATIONS)
+    unknown = (requested - set(USER_FIELDS)) | (relations - set(USER_RELATIONS))
+    if unknown:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unknown fields: {sorted(unknown)}. Valid values: {list(USER_FIELDS + USER_RELATIONS)}",
+        )
+    return UserFieldset(requested or set(USER_FIELDS), relations)
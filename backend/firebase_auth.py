@@ -0,0 +1,176 @@
+"""
+Firebase ID トークンの検証
+
+- 署名鍵（JWKS）を取得してキャッシュ。Cache-Control の max-age で期限切れにし、
+  未知の kid が来たときは鍵ローテーションとみなして再取得（最短間隔あり）
+- 検証済みトークンを SHA-256 ハッシュをキーに LRU で保持し、トークンの `exp`
+  で失効させる。同じトークンでの2回目以降のリクエストは署名検証を省略
+
+環境変数:
+    FIREBASE_PROJECT_ID       aud / iss の検証に使うプロジェクトID（必須）
+    FIREBASE_JWKS_URL         署名鍵の取得先（既定: Google securetoken の JWKS）
+    FIREBASE_JWKS_FILE        ローカルの JWKS ファイル（指定時は URL より優先）
+    FIREBASE_TOKEN_CACHE_SIZE 検証済みトークンキャッシュの最大件数（既定: 10000）
+"""
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+import urllib.request
+from collections import OrderedDict
+from typing import Dict, Optional
+
+import jwt
+
+DEFAULT_JWKS_URL = (
+    "https://www.googleapis.com/service_accounts/v1/jwk/"
+    "securetoken@system.gserviceaccount.com"
+)
+
+
+class InvalidTokenError(Exception):
+    """トークンの形式・署名・クレームが不正"""
+
+
+class SigningKeyStore:
+    """JWKS の取得とキャッシュ（kid → 公開鍵）"""
+
+    def __init__(
+        self,
+        url: Optional[str] = None,
+        path: Optional[str] = None,
+        default_max_age: float = 3600,
+        min_refresh_interval: float = 60,
+    ) -> None:
+        self.url = url
+        self.path = path
+        self.default_max_age = default_max_age
+        self.min_refresh_interval = min_refresh_interval
+        self._lock = threading.Lock()
+        self._keys: Dict[str, object] = {}
+        self._expires_at = 0.0
+        self._fetched_at = 0.0
+
+    def _fetch(self) -> tuple:
+        if self.path:
+            with open(self.path, "r", encoding="utf-8") as f:
+                return json.load(f), self.default_max_age
+        with urllib.request.urlopen(self.url, timeout=10) as resp:
+            max_age = self.default_max_age
+            match = re.search(r"max-age=(\d+)", resp.headers.get("Cache-Control", ""))
+            if match:
+                max_age = float(match.group(1))
+            return json.loads(resp.read()), max_age
+
+    def _refresh(self) -> None:
+        jwks, max_age = self._fetch()
+        keys = {}
+        for jwk in jwks.get("keys", []):
+            if jwk.get("kid"):
+                keys[jwk["kid"]] = jwt.PyJWK(jwk, algorithm="RS256").key
+        now = time.monotonic()
+        self._keys = keys
+        self._fetched_at = now
+        self._expires_at = now + max_age
+
+    def get(self, kid: str):
+        now = time.monotonic()
+        key = self._keys.get(kid)
+        if key is not None and now < self._expires_at:
+            return key
+        with self._lock:
+            key = self._keys.get(kid)
+            expired = time.monotonic() >= self._expires_at
+            # 未知の kid は鍵ローテーションの可能性があるため再取得する（間隔制限あり）
+            if expired or (
+                key is None
+                and time.monotonic() - self._fetched_at >= self.min_refresh_interval
+            ):
+                try:
+                    self._refresh()
+                except (OSError, ValueError, jwt.PyJWTError):
+                    # 取得に失敗しても、手元の鍵があればそのまま使う
+                    if key is None:
+                        raise InvalidTokenError("Signing keys are unavailable")
+                else:
+                    key = self._keys.get(kid)
+        if key is None:
+            raise InvalidTokenError(f"Unknown signing key: {kid}")
+        return key
+
+
+class VerifiedTokenCache:
+    """検証済みトークンの LRU（キー: トークンの SHA-256、`exp` で失効）"""
+
+    def __init__(self, max_size: int = 10000) -> None:
+        self.max_size = max_size
+        self._lock = threading.Lock()
+        self._items: "OrderedDict[str, dict]" = OrderedDict()
+
+    @staticmethod
+    def _key(token: str) -> str:
+        return hashlib.sha256(token.encode("utf-8")).hexdigest()
+
+    def get(self, token: str) -> Optional[dict]:
+        key = self._key(token)
+        with self._lock:
+            claims = self._items.get(key)
+            if claims is None:
+                return None
+            if claims["exp"] <= time.time():
+                del self._items[key]
+                return None
+            self._items.move_to_end(key)
+            return claims
+
+    def put(self, token: str, claims: dict) -> None:
+        key = self._key(token)
+        with self._lock:
+            self._items[key] = claims
+            self._items.move_to_end(key)
+            while len(self._items) > self.max_size:
+                self._items.popitem(last=False)
+
+
+PROJECT_ID = os.getenv("FIREBASE_PROJECT_ID", "")
+
+signing_keys = SigningKeyStore(
+    url=os.getenv("FIREBASE_JWKS_URL", DEFAULT_JWKS_URL),
+    path=os.getenv("FIREBASE_JWKS_FILE") or None,
+)
+verified_tokens = VerifiedTokenCache(
+    max_size=int(os.getenv("FIREBASE_TOKEN_CACHE_SIZE", "10000"))
+)
+
+
+def verify_firebase_token(token: str) -> dict:
+    """RS256 署名と aud / iss / exp / sub を検証してクレームを返す"""
+    cached = verified_tokens.get(token)
+    if cached is not None:
+        return cached
+    if not PROJECT_ID:
+        raise InvalidTokenError("FIREBASE_PROJECT_ID is not set")
+    try:
+        header = jwt.get_unverified_header(token)
+    except jwt.PyJWTError as e:
+        raise InvalidTokenError(str(e)) from e
+    if header.get("alg") != "RS256" or not header.get("kid"):
+        raise InvalidTokenError("Token must be RS256 with a kid header")
+    key = signing_keys.get(header["kid"])
+    try:
+        claims = jwt.decode(
+            token,
+            key,
+            algorithms=["RS256"],
+            audience=PROJECT_ID,
+            issuer=f"https://securetoken.google.com/{PROJECT_ID}",
+            options={"require": ["exp", "iat", "sub"]},
+        )
+    except jwt.PyJWTError as e:
+        raise InvalidTokenError(str(e)) from e
+    if not claims.get("sub"):
+        raise InvalidTokenError("Token has an empty subject")
+    verified_tokens.put(token, claims)
+    return claims
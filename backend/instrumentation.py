@@ -0,0 +1,123 @@
+"""
+リクエスト単位のSQL計測と N+1 検出
+
+SQLAlchemy の cursor 実行イベントでクエリ数・DB時間・ステートメント形状ごとの
+実行回数を集計し、ミドルウェアがレスポンスヘッダ（Server-Timing,
+X-DB-Query-Count, X-DB-Time-Ms）とログに出力します。
+
+同じ形状のステートメントが1リクエスト内で SQL_N_PLUS_ONE_THRESHOLD 回を
+超えると N+1 とみなして警告します。SQL_N_PLUS_ONE_RAISE=true（テスト用）
+では NPlusOneError を送出してリクエストを失敗させます。
+"""
+import contextvars
+import logging
+import os
+import time
+from collections import Counter
+from contextlib import contextmanager
+from typing import Iterator, Optional
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from starlette.middleware.base import BaseHTTPMiddleware
+from starlette.requests import Request
+
+logger = logging.getLogger("backend.sql")
+
+N_PLUS_ONE_THRESHOLD = int(os.getenv("SQL_N_PLUS_ONE_THRESHOLD", "10"))
+N_PLUS_ONE_RAISE = os.getenv("SQL_N_PLUS_ONE_RAISE", "false").lower() == "true"
+
+
+class NPlusOneError(RuntimeError):
+    """同じ形状のクエリがしきい値を超えて実行された"""
+
+
+class QueryStats:
+    """1リクエスト（または1ブロック）分のクエリ集計"""
+
+    def __init__(self, threshold: int = N_PLUS_ONE_THRESHOLD, raise_on_n_plus_one: bool = N_PLUS_ONE_RAISE):
+        self.threshold = threshold
+        self.raise_on_n_plus_one = raise_on_n_plus_one
+        self.count = 0
+        self.duration_s = 0.0
+        self.shapes: Counter = Counter()
+        self.repeated: set = set()
+
+    @property
+    def duration_ms(self) -> float:
+        return self.duration_s * 1000
+
+    def record(self, statement: str, duration_s: float) -> None:
+        self.count += 1
+        self.duration_s += duration_s
+        # パラメータはバインド済みなので、SQL文字列そのものを形状として扱う
+        self.shapes[statement] += 1
+        if self.shapes[statement] > self.threshold and statement not in self.repeated:
+            self.repeated.add(statement)
+            if self.raise_on_n_plus_one:
+                raise NPlusOneError(
+                    f"Statement executed more than {self.threshold} times: {statement[:200]}"
+                )
+
+
+_current_stats: contextvars.ContextVar[Optional[QueryStats]] = contextvars.ContextVar(
+    "sql_query_stats", default=None
+)
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if _current_stats.get() is not None:
+        conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    stats = _current_stats.get()
+    if stats is None:
+        return
+    starts = conn.info.get("query_start")
+    if not starts:
+        return
+    stats.record(statement, time.perf_counter() - starts.pop())
+
+
+@contextmanager
+def query_stats(**kwargs) -> Iterator[QueryStats]:
+    """ブロック内で実行されたクエリを集計する（スクリプト・テスト用）
+
+        with query_stats() as stats:
+            client.get("/users/")
+        assert stats.count <= 3
+    """
+    stats = QueryStats(**kwargs)
+    token = _current_stats.set(stats)
+    try:
+        yield stats
+    finally:
+        _current_stats.reset(token)
+
+
+class QueryStatsMiddleware(BaseHTTPMiddleware):
+    """リクエストごとのクエリ数・DB時間をヘッダとログに出力する"""
+
+    async def dispatch(self, request: Request, call_next):
+        with query_stats() as stats:
+            response = await call_next(request)
+        response.headers["Server-Timing"] = (
+            f'db;dur={stats.duration_ms:.2f};desc="{stats.count} queries"'
+        )
+        response.headers["X-DB-Query-Count"] = str(stats.count)
+        response.headers["X-DB-Time-Ms"] = f"{stats.duration_ms:.2f}"
+        route = f"{request.method} {request.url.path}"
+        if stats.repeated:
+            for statement in stats.repeated:
+                logger.warning(
+                    "Possible N+1 on %s: %d executions of %s",
+                    route, stats.shapes[statement], statement[:200],
+                )
+        logger.info(
+            "%s -> %s queries=%d db_ms=%.2f",
+            route, response.status_code, stats.count, stats.duration_ms,
+        )
+        return response
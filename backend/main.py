@@ -1,18 +1,25 @@
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
 from .db import ensure_schema
+from .instrumentation import QueryStatsMiddleware
 from .routers import me as me_router
 from .routers import users as users_router
 from .routers import stats as stats_router
 from .routers import trainings as trainings_router
+from .routers import exports as exports_router
 
 
-# Initialize DB schema (idempotent)
-ensure_schema()
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Schema version check (migrations run only when the ledger is behind)
+    ensure_schema()
+    yield
 
 
-app = FastAPI()
+app = FastAPI(lifespan=lifespan)
 
 origins = [
     "http://localhost:3000",
@@ -21,12 +28,16 @@ origins = [
     "*",
 ]
 
+# Per-request query count / DB time (Server-Timing header, N+1 warnings)
+app.add_middleware(QueryStatsMiddleware)
+
 app.add_middleware(
     CORSMiddleware,
     allow_origins=origins,
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["Server-Timing", "X-DB-Query-Count", "X-DB-Time-Ms"],
 )
 
 
@@ -35,3 +46,4 @@ app.include_router(me_router.router)
 app.include_router(users_router.router)
 app.include_router(stats_router.router)
 app.include_router(trainings_router.router)
+app.include_router(exports_router.router)
@@ -0,0 +1,29 @@
+"""
+体力測定の種目定義
+
+`user_results` の測定種目（カラム名）と、値の良し悪しの向きをまとめます。
+タイム系（ms）は小さいほど良く、それ以外は大きいほど良い種目です。
+"""
+from typing import Dict, List
+
+# 主要5種目（AverageData / MaxData と共通）
+FITNESS_METRICS: List[str] = [
+    "long_jump_cm",
+    "fifty_meter_run_ms",
+    "spider_ms",
+    "eight_shape_run_count",
+    "ball_throw_cm",
+]
+
+# 小さいほど良い種目
+LOWER_IS_BETTER = frozenset({"fifty_meter_run_ms", "spider_ms"})
+
+# API で使う種目名 → UserResult の属性名（25m走は属性名が列名と異なる）
+RESULT_ATTRIBUTES: Dict[str, str] = {
+    **{name: name for name in FITNESS_METRICS},
+    "25m_run": "_25m_run",
+}
+
+
+def higher_is_better(metric: str) -> bool:
+    return metric not in LOWER_IS_BETTER
@@ -0,0 +1,215 @@
+"""
+バージョン管理されたスキーママイグレーション
+
+`schema_version` テーブルに適用済みのバージョンを記録し、未適用の
+マイグレーションだけを順番に実行します。
+
+- 起動時は `SELECT max(version)` の1クエリだけで最新かどうかを判定
+- 未適用がある場合のみロックを取得して実行（PostgreSQL: advisory lock、
+  SQLite: BEGIN IMMEDIATE）。複数ワーカーが同時に起動しても実行は1回だけ
+
+新しいマイグレーションは `MIGRATIONS` の末尾に追加してください。
+既存DB（ledger導入前に ensure_schema で作られたDB）でも安全に流せるよう、
+各マイグレーションは冪等に書きます。
+
+使用方法（デプロイ時に1回だけ実行する場合）:
+    python -m backend.migrations
+"""
+import datetime
+from typing import Callable, List, Optional, Tuple
+
+from sqlalchemy import (
+    Column,
+    DateTime,
+    Integer,
+    MetaData,
+    String,
+    Table,
+    exc,
+    inspect,
+    select,
+    text,
+)
+from sqlalchemy.engine import Connection, Engine
+
+# PostgreSQL advisory lock のキー（任意の固定値）
+ADVISORY_LOCK_KEY = 727_001
+
+_ledger_metadata = MetaData()
+
+schema_version = Table(
+    "schema_version",
+    _ledger_metadata,
+    Column("version", Integer, primary_key=True),
+    Column("name", String, nullable=False),
+    Column("applied_at", DateTime, nullable=False),
+)
+
+
+def _columns(conn: Connection, table: str) -> List[str]:
+    return [c["name"] for c in inspect(conn).get_columns(table)]
+
+
+def _create_tables(conn: Connection) -> None:
+    from .db import Base
+    from . import models  # noqa: F401 - ensure models are imported
+
+    Base.metadata.create_all(bind=conn)
+
+
+def _add_user_columns(conn: Connection) -> None:
+    cols = _columns(conn, "users")
+    uid_type = "VARCHAR(255)" if conn.dialect.name == "postgresql" else "TEXT"
+    if "firebase_uid" not in cols:
+        conn.execute(text(f"ALTER TABLE users ADD COLUMN firebase_uid {uid_type}"))
+        conn.execute(text(
+            "CREATE UNIQUE INDEX IF NOT EXISTS idx_users_firebase_uid ON users(firebase_uid)"))
+    if "birthday" not in cols:
+        conn.execute(text("ALTER TABLE users ADD COLUMN birthday DATE"))
+
+
+def _add_user_result_columns(conn: Connection) -> None:
+    cols = _columns(conn, "user_results")
+    if "25m_run" not in cols:
+        conn.execute(text('ALTER TABLE user_results ADD COLUMN "25m_run" INTEGER'))
+    if "serfece" not in cols:
+        conn.execute(text("ALTER TABLE user_results ADD COLUMN serfece INTEGER"))
+    if "test_format" not in cols:
+        conn.execute(text("ALTER TABLE user_results ADD COLUMN test_format INTEGER"))
+
+
+def _add_users_name_id_index(conn: Connection) -> None:
+    conn.execute(text(
+        "CREATE INDEX IF NOT EXISTS idx_users_name_id ON users(name, id)"))
+
+
+def _add_user_results_user_date_index(conn: Connection) -> None:
+    conn.execute(text(
+        "CREATE INDEX IF NOT EXISTS idx_user_results_user_date "
+        "ON user_results(user_id, date)"))
+
+
+def _add_grade_metric_stats(conn: Connection) -> None:
+    from .analytics import grade_stats
+
+    grade_stats.stats_table.create(bind=conn, checkfirst=True)
+    # 既存の測定結果から集計と average_data / max_data を作る
+    grade_stats.rebuild(conn)
+
+
+def _add_user_personal_bests(conn: Connection) -> None:
+    from .analytics import leaderboards
+
+    leaderboards.bests_table.create(bind=conn, checkfirst=True)
+    conn.execute(text(
+        "CREATE INDEX IF NOT EXISTS idx_personal_bests_board "
+        "ON user_personal_bests(metric, serfece, test_format, value)"))
+    leaderboards.rebuild(conn)
+
+
+def _add_user_results_breakdown_index(conn: Connection) -> None:
+    conn.execute(text(
+        "CREATE INDEX IF NOT EXISTS idx_user_results_breakdown ON user_results("
+        "serfece, test_format, user_id, long_jump_cm, fifty_meter_run_ms, "
+        "spider_ms, eight_shape_run_count, ball_throw_cm)"))
+
+
+def _add_user_results_anomaly(conn: Connection) -> None:
+    if "anomaly" not in _columns(conn, "user_results"):
+        conn.execute(text("ALTER TABLE user_results ADD COLUMN anomaly VARCHAR"))
+
+
+def _add_trainings_series_index(conn: Connection) -> None:
+    # シリーズ列は scripts/migrations で後から追加された DB もあるため、無ければ追加する
+    columns = _columns(conn, "trainings")
+    for name, sql_type in (
+        ("series_name", "VARCHAR"), ("series_number", "INTEGER"), ("page_number", "INTEGER"),
+    ):
+        if name not in columns:
+            conn.execute(text(f"ALTER TABLE trainings ADD COLUMN {name} {sql_type}"))
+    conn.execute(text(
+        "CREATE INDEX IF NOT EXISTS idx_trainings_series ON trainings("
+        "training_type, series_name, series_number, page_number)"))
+
+
+def _recreate_user_results_breakdown_index(conn: Connection) -> None:
+    # 集計から確認待ちの外れ値（anomaly IS NOT NULL）を除くため部分インデックスに作り直す
+    conn.execute(text("DROP INDEX IF EXISTS idx_user_results_breakdown"))
+    conn.execute(text(
+        "CREATE INDEX idx_user_results_breakdown ON user_results("
+        "serfece, test_format, user_id, long_jump_cm, fifty_meter_run_ms, "
+        "spider_ms, eight_shape_run_count, ball_throw_cm) WHERE anomaly IS NULL"))
+
+
+# (version, name, migration) — バージョンは連番で、適用順に並べる
+MIGRATIONS: List[Tuple[int, str, Callable[[Connection], None]]] = [
+    (1, "create_tables", _create_tables),
+    (2, "add_users_firebase_uid_birthday", _add_user_columns),
+    (3, "add_user_results_25m_run_serfece_test_format", _add_user_result_columns),
+    (4, "add_users_name_id_index", _add_users_name_id_index),
+    (5, "add_user_results_user_date_index", _add_user_results_user_date_index),
+    (6, "add_grade_metric_stats", _add_grade_metric_stats),
+    (7, "add_user_personal_bests", _add_user_personal_bests),
+    (8, "add_user_results_breakdown_index", _add_user_results_breakdown_index),
+    (9, "add_user_results_anomaly", _add_user_results_anomaly),
+    (10, "add_trainings_series_index", _add_trainings_series_index),
+    (11, "recreate_user_results_breakdown_index", _recreate_user_results_breakdown_index),
+]
+
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+
+def current_version(engine: Engine) -> Optional[int]:
+    """適用済みの最新バージョン（ledger が無ければ None）"""
+    try:
+        with engine.connect() as conn:
+            return conn.execute(select(schema_version.c.version).order_by(
+                schema_version.c.version.desc()).limit(1)).scalar()
+    except (exc.OperationalError, exc.ProgrammingError):
+        return None
+
+
+def _lock(conn: Connection) -> None:
+    if conn.dialect.name == "postgresql":
+        # トランザクション終了時に自動で解放される
+        conn.execute(text("SELECT pg_advisory_xact_lock(:key)"),
+                     {"key": ADVISORY_LOCK_KEY})
+    elif conn.dialect.name == "sqlite":
+        # 書き込みロックを先に取り、他ワーカーのマイグレーションを待たせる
+        conn.exec_driver_sql("BEGIN IMMEDIATE")
+
+
+def _apply_pending(conn: Connection) -> List[int]:
+    schema_version.create(bind=conn, checkfirst=True)
+    applied = set(conn.execute(select(schema_version.c.version)).scalars())
+    newly_applied = []
+    for version, name, migrate in MIGRATIONS:
+        if version in applied:
+            continue
+        migrate(conn)
+        conn.execute(schema_version.insert().values(
+            version=version, name=name, applied_at=datetime.datetime.utcnow()))
+        newly_applied.append(version)
+    return newly_applied
+
+
+def run_migrations(engine: Engine) -> List[int]:
+    """未適用のマイグレーションを適用し、適用したバージョンを返す"""
+    if current_version(engine) == LATEST_VERSION:
+        return []
+    with engine.connect() as conn:
+        _lock(conn)
+        # ロック待ちの間に他のワーカーが適用済みの可能性があるため再確認する
+        applied = _apply_pending(conn)
+        conn.commit()
+    return applied
+
+
+if __name__ == "__main__":
+    from .db import engine
+
+    applied = run_migrations(engine)
+    if applied:
+        print(f"Applied migrations: {applied}")
+    else:
+        print(f"Schema is up to date (version {LATEST_VERSION})")
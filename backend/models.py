@@ -12,6 +12,7 @@ from sqlalchemy import (
     TypeDecorator,
     Text,
     Index,
+    text,
 )
 from sqlalchemy.dialects.postgresql import UUID as PostgresUUID
 from sqlalchemy.orm import relationship
@@ -70,6 +71,9 @@ class User(Base):
     results = relationship("UserResult", back_populates="user")
     training_results = relationship("UserTrainingResult", back_populates="user")
 
+    # GET /users/ のキーセットページング（ORDER BY name, id）用
+    __table_args__ = (Index("idx_users_name_id", "name", "id"),)
+
 
 class UserResult(Base):
     __tablename__ = "user_results"
@@ -86,8 +90,30 @@ class UserResult(Base):
     # Enumの値が数値のため、Integer型で保存
     serfece = Column(Integer, nullable=True)
     test_format = Column(Integer, nullable=True)
+    # 登録時の外れ値判定の理由（疑わしくなければ NULL、backend.analytics.outliers）
+    anomaly = Column(String, nullable=True)
     user = relationship("User", back_populates="results")
 
+    __table_args__ = (
+        # 日付範囲の絞り込みと ORDER BY date 用
+        Index("idx_user_results_user_date", "user_id", "date"),
+        # GET /stats/breakdowns 用のカバリングインデックス（テーブル本体を読まない）。
+        # 確認待ちの外れ値は集計しないため部分インデックスにする
+        Index(
+            "idx_user_results_breakdown",
+            "serfece",
+            "test_format",
+            "user_id",
+            "long_jump_cm",
+            "fifty_meter_run_ms",
+            "spider_ms",
+            "eight_shape_run_count",
+            "ball_throw_cm",
+            sqlite_where=text("anomaly IS NULL"),
+            postgresql_where=text("anomaly IS NULL"),
+        ),
+    )
+
 
 class AverageData(Base):
     __tablename__ = "average_data"
@@ -113,6 +139,39 @@ class MaxData(Base):
     total_score = Column(Integer)
 
 
+class GradeMetricStats(Base):
+    """学年 × 種目の集計（user_results から差分更新、backend.analytics.grade_stats）"""
+
+    __tablename__ = "grade_metric_stats"
+    grade = Column(String, primary_key=True)  # 学年未設定は ""
+    metric = Column(String, primary_key=True)  # FITNESS_METRICS の種目名
+    value_count = Column(Integer, nullable=False, default=0)
+    value_sum = Column(Float, nullable=False, default=0.0)
+    value_sum_sq = Column(Float, nullable=False, default=0.0)
+    min_value = Column(Float, nullable=True)
+    max_value = Column(Float, nullable=True)
+
+
+class UserPersonalBest(Base):
+    """選手ごとの自己ベスト（リーダーボード用、backend.analytics.leaderboards）
+
+    serfece / test_format の 0 は「すべて」を表す（Enum の値は 1 始まり）。
+    """
+
+    __tablename__ = "user_personal_bests"
+    user_id = Column(GUID(), ForeignKey("users.id"), primary_key=True)
+    metric = Column(String, primary_key=True)
+    serfece = Column(Integer, primary_key=True)
+    test_format = Column(Integer, primary_key=True)
+    value = Column(Float, nullable=False)
+    date = Column(Date, nullable=False)
+
+    # 種目・条件ごとのボードの読み込み用
+    __table_args__ = (
+        Index("idx_personal_bests_board", "metric", "serfece", "test_format", "value"),
+    )
+
+
 class Training(Base):
     """トレーニング項目マスタ（ストレッチ、コア、筋トレ、ラダーなど）"""
 
@@ -138,6 +197,11 @@ class Training(Base):
     )
     results = relationship("UserTrainingResult", back_populates="training")
 
+    __table_args__ = (
+        # GET /training-series 用（シリーズごとにページ順で読む）
+        Index("idx_trainings_series", "training_type", "series_name", "series_number", "page_number"),
+    )
+
 
 class UserTrainingResult(Base):
     """ユーザーのトレーニング実施結果"""
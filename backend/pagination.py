@@ -0,0 +1,30 @@
+"""
+キーセット（カーソル）ページング用のカーソル
+
+カーソルは最後に返した行のソートキーを JSON 化して base64url で
+エンコードした不透明な文字列です。クライアントは中身を解釈せず、
+レスポンスの X-Next-Cursor ヘッダの値を次のリクエストの `cursor` に渡します。
+"""
+import base64
+import json
+from typing import Any, List
+
+from fastapi import HTTPException
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+def encode_cursor(values: List[Any]) -> str:
+    raw = json.dumps([str(v) if v is not None else None for v in values])
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str, size: int) -> List[Any]:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+    except (ValueError, UnicodeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    if not isinstance(values, list) or len(values) != size:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return values
@@ -0,0 +1,98 @@
+"""
+コネクションプールの計測
+
+QueuePool を拡張し、接続取得の待ち時間・タイムアウト回数を記録します。
+`get_pool_stats()` でプールの現在値と累積値をまとめて取得できます。
+"""
+import threading
+import time
+from typing import Dict, Optional
+
+from sqlalchemy import exc
+from sqlalchemy.engine import Engine
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+
+
+class PoolMetrics:
+    """接続取得の累積統計（スレッドセーフ）"""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.checkouts = 0
+        self.timeouts = 0
+        self.wait_total_s = 0.0
+        self.wait_max_s = 0.0
+
+    def record_wait(self, seconds: float) -> None:
+        with self._lock:
+            self.checkouts += 1
+            self.wait_total_s += seconds
+            if seconds > self.wait_max_s:
+                self.wait_max_s = seconds
+
+    def record_timeout(self, seconds: float) -> None:
+        with self._lock:
+            self.timeouts += 1
+            self.wait_total_s += seconds
+            if seconds > self.wait_max_s:
+                self.wait_max_s = seconds
+
+    def snapshot(self) -> Dict[str, float]:
+        with self._lock:
+            attempts = self.checkouts + self.timeouts
+            return {
+                "checkouts": self.checkouts,
+                "timeouts": self.timeouts,
+                "wait_total_ms": round(self.wait_total_s * 1000, 3),
+                "wait_avg_ms": round(self.wait_total_s * 1000 / attempts, 3)
+                if attempts
+                else 0.0,
+                "wait_max_ms": round(self.wait_max_s * 1000, 3),
+            }
+
+
+class _TimedGetMixin:
+    """接続取得にかかった時間とタイムアウトを記録する"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.metrics = PoolMetrics()
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            conn = super()._do_get()
+        except exc.TimeoutError:
+            self.metrics.record_timeout(time.perf_counter() - start)
+            raise
+        self.metrics.record_wait(time.perf_counter() - start)
+        return conn
+
+
+class InstrumentedQueuePool(_TimedGetMixin, QueuePool):
+    """同期エンジン用の計測付き QueuePool"""
+
+
+class InstrumentedAsyncQueuePool(_TimedGetMixin, AsyncAdaptedQueuePool):
+    """非同期エンジン用の計測付き QueuePool"""
+
+
+def get_pool_stats(engine: Engine) -> Dict[str, Optional[float]]:
+    """エンジンのプール状態（現在値 + 累積値）を返す"""
+    pool = engine.pool
+    stats: Dict[str, Optional[float]] = {"pool_class": type(pool).__name__}
+    if isinstance(pool, QueuePool):
+        stats.update(
+            {
+                "size": pool.size(),
+                "checked_in": pool.checkedin(),
+                "checked_out": pool.checkedout(),
+                "overflow": pool.overflow(),
+                "max_overflow": pool._max_overflow,
+                "timeout_s": pool.timeout(),
+            }
+        )
+    metrics = getattr(pool, "metrics", None)
+    if metrics is not None:
+        stats.update(metrics.snapshot())
+    return stats
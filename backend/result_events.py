@@ -0,0 +1,76 @@
+"""
+測定結果の追加・削除イベント
+
+集計系のインメモリ構造（パーセンタイル、学年別集計など）は、測定結果の
+登録・削除時にここへ通知された行で差分更新します。通知はコミット後に
+行うため、ロールバックされた行が反映されることはありません。
+
+行は dict で、`id`（一括登録では None）/ `user_id` / `grade`（登録時点のユーザーの学年）/ `date` と
+各種目の値（backend.metrics.FITNESS_METRICS）、`serfece` / `test_format` を含みます。
+
+リスナーは次のメソッドを必要に応じて実装し、`register()` で登録します。
+    on_results_added(rows)
+    on_result_deleted(row)
+    on_user_grade_changed(user_id, old_grade, new_grade)
+"""
+import logging
+import uuid
+from typing import Iterable, Optional
+
+from .metrics import FITNESS_METRICS
+
+logger = logging.getLogger("backend.result_events")
+
+_listeners: list = []
+
+
+def register(listener) -> None:
+    if listener not in _listeners:
+        _listeners.append(listener)
+
+
+def _notify(method: str, *args) -> None:
+    for listener in _listeners:
+        handler = getattr(listener, method, None)
+        if handler is None:
+            continue
+        try:
+            handler(*args)
+        except Exception:
+            # 集計の更新失敗で登録APIを失敗させない（次回の再構築で整合する）
+            logger.exception("%s.%s failed", type(listener).__name__, method)
+
+
+def results_added(rows: Iterable[dict]) -> None:
+    rows = list(rows)
+    if rows:
+        _notify("on_results_added", rows)
+
+
+def result_deleted(row: dict) -> None:
+    _notify("on_result_deleted", row)
+
+
+def user_grade_changed(user_id: uuid.UUID, old_grade: Optional[str], new_grade: Optional[str]) -> None:
+    if old_grade != new_grade:
+        _notify("on_user_grade_changed", user_id, old_grade, new_grade)
+
+
+def result_row(result, grade: Optional[str]) -> dict:
+    """UserResult（または同じキーを持つ dict）をイベント用の dict にする"""
+    if isinstance(result, dict):
+        get = result.get
+    else:
+        def get(key):
+            return getattr(result, key, None)
+    row = {
+        "id": get("id"),
+        "user_id": get("user_id"),
+        "grade": grade,
+        "date": get("date"),
+        "serfece": get("serfece"),
+        "test_format": get("test_format"),
+    }
+    for metric in FITNESS_METRICS:
+        row[metric] = get(metric)
+    return row
@@ -0,0 +1,33 @@
+import datetime
+from typing import Optional
+from fastapi import APIRouter, HTTPException, Query
+from fastapi.responses import StreamingResponse
+from ..export import FORMATS, ExportError, build_query, export_chunks
+
+router = APIRouter()
+
+
+@router.get("/exports/{dataset}")
+def export_dataset(
+    dataset: str,
+    format: str = Query("csv", pattern="^(csv|parquet|arrow)$"),
+    date_from: Optional[datetime.date] = Query(None, alias="from"),
+    date_to: Optional[datetime.date] = Query(None, alias="to"),
+    grade: Optional[str] = None,
+):
+    """user_results / user_training_results / training_feedback_messages のダウンロード
+
+    サーバーサイドカーソルでバッチごとに読みながらストリーミングする。
+    """
+    try:
+        stmt = build_query(dataset, date_from, date_to, grade)
+        chunks = export_chunks(stmt, format)
+    except ExportError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    media_type, extension = FORMATS[format]
+    filename = f"{dataset}.{extension}"
+    return StreamingResponse(
+        chunks,
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
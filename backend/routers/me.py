@@ -1,8 +1,18 @@
+from typing import Optional
 from fastapi import APIRouter, HTTPException, Request, Depends
-from sqlalchemy.orm import Session
-from ..deps import get_current_firebase_uid, get_db
-from .. import models
-from ..schemas import UserRead
+from fastapi.responses import JSONResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+from ..db import async_engine, engine, replica_engines
+from ..deps import (
+    get_async_db,
+    get_current_firebase_uid,
+    get_current_user_profile,
+    get_or_create_user,
+    user_identity_cache,
+)
+from ..fieldsets import UserFieldset, user_fieldset
+from ..pool import get_pool_stats
+from ..schemas import UserProfile, UserRead
 
 router = APIRouter()
 
@@ -12,18 +22,36 @@ async def health():
     return {"status": "ok"}
 
 
+@router.get("/health/db-pool")
+def health_db_pool():
+    """コネクションプールの利用状況（ワーカー数とプールサイズの調整用）"""
+    return {
+        "sync": get_pool_stats(engine),
+        "async": get_pool_stats(async_engine.sync_engine),
+        "replicas": [get_pool_stats(e) for e in replica_engines],
+    }
+
+
 @router.get("/me", response_model=UserRead)
-async def get_me(request: Request, db: Session = Depends(get_db)):
+async def get_me(
+    request: Request,
+    db: AsyncSession = Depends(get_async_db),
+    fieldset: Optional[UserFieldset] = Depends(user_fieldset),
+):
     uid = await get_current_firebase_uid(request)
     if not uid:
         raise HTTPException(status_code=401, detail="Unauthorized")
-    user = db.query(models.User).filter(
-        models.User.firebase_uid == uid).first()
-    if user is None:
-        user = models.User(name="User", grade="", firebase_uid=uid)
-        db.add(user)
-        db.commit()
-        db.refresh(user)
-    if not user.results:
-        user.results = []
-    return user
+    if fieldset is None:
+        return await get_or_create_user(db, uid, with_results=True)
+    if not fieldset.wants_results:
+        # results 不要ならキャッシュ済みプロフィールで返せる
+        user = user_identity_cache.get(uid) or await get_or_create_user(db, uid)
+    else:
+        user = await get_or_create_user(db, uid, with_results=True)
+    return JSONResponse(content=fieldset.serialize(user))
+
+
+@router.get("/me/profile", response_model=UserProfile)
+async def get_me_profile(profile: UserProfile = Depends(get_current_user_profile)):
+    """results を含まない /me（ページ読み込みごとの呼び出し用）"""
+    return profile
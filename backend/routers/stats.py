@@ -1,47 +1,245 @@
-from fastapi import APIRouter, HTTPException, Depends
+import uuid
+import numpy as np
+from fastapi import APIRouter, HTTPException, Depends, Query, Request, Response
+from sqlalchemy import select
 from sqlalchemy.orm import Session
+from ..analytics.breakdowns import breakdowns
+from ..analytics.grade_data import Rendered, get_grade_data, invalidate_grade_data
+from ..analytics.grade_stats import grade_filter
+from ..analytics.leaderboards import ANY, leaderboards
+from ..analytics.percentiles import cohort_percentiles
+from ..analytics.trends import athlete_trends, classify
+from ..cache import conditional_response
 from ..deps import get_db
 from .. import models
+from ..enums import SurfaceType, TestFormat
+from ..metrics import FITNESS_METRICS
 from ..schemas import (
     AverageDataCreate, AverageDataResponse,
-    MaxDataCreate, MaxDataResponse
+    MaxDataCreate, MaxDataResponse,
+    AthleteTrend, CohortBreakdown, GradeData, Leaderboard, LeaderboardEntry,
+    MetricPercentile, MetricTrend, UserPercentilesResponse,
 )
-from typing import List
+from typing import List, Optional
 
 router = APIRouter()
 
 
+def _cached_response(request: Request, rendered: Optional[Rendered], not_found: str) -> Response:
+    if rendered is None:
+        raise HTTPException(status_code=404, detail=not_found)
+    return conditional_response(request, *rendered)
+
+
 @router.post("/average_data/", response_model=AverageDataResponse)
 def create_average_data(average_data: AverageDataCreate, db: Session = Depends(get_db)):
+    """手入力の平均値（測定結果のある学年は登録・削除のたびに集計値で上書きされる）"""
     db_average_data = models.AverageData(**average_data.model_dump())
     db.add(db_average_data)
     db.commit()
     db.refresh(db_average_data)
+    invalidate_grade_data()
     return db_average_data
 
 
 @router.get("/average_data/grade/{grade}", response_model=AverageDataResponse)
-def read_average_data_by_grade(grade: str, db: Session = Depends(get_db)):
-    db_average_data = db.query(models.AverageData).filter(
-        models.AverageData.grade == grade).first()
-    if db_average_data is None:
-        raise HTTPException(status_code=404, detail="Average data not found")
-    return db_average_data
+def read_average_data_by_grade(grade: str, request: Request, db: Session = Depends(get_db)):
+    snapshot = get_grade_data(db)
+    return _cached_response(request, snapshot.average.get(grade), "Average data not found")
 
 
 @router.post("/max_data/", response_model=MaxDataResponse)
 def create_max_data(max_data: MaxDataCreate, db: Session = Depends(get_db)):
+    """手入力の最高記録（測定結果のある学年は登録・削除のたびに集計値で上書きされる）"""
     db_max_data = models.MaxData(**max_data.model_dump())
     db.add(db_max_data)
     db.commit()
     db.refresh(db_max_data)
+    invalidate_grade_data()
     return db_max_data
 
 
 @router.get("/max_data/grade/{grade}", response_model=MaxDataResponse)
-def read_max_data_by_grade(grade: str, db: Session = Depends(get_db)):
-    db_max_data = db.query(models.MaxData).filter(
-        models.MaxData.grade == grade).first()
-    if db_max_data is None:
-        raise HTTPException(status_code=404, detail="Max data not found")
-    return db_max_data
+def read_max_data_by_grade(grade: str, request: Request, db: Session = Depends(get_db)):
+    snapshot = get_grade_data(db)
+    return _cached_response(request, snapshot.max.get(grade), "Max data not found")
+
+
+@router.get("/stats/grades", response_model=List[GradeData])
+def read_grade_data(request: Request, db: Session = Depends(get_db)):
+    """全学年の平均値・最高記録を1レスポンスで返す"""
+    return _cached_response(request, get_grade_data(db).grades, "")
+
+
+@router.get("/stats/percentile", response_model=MetricPercentile)
+def read_percentile(
+    grade: str,
+    metric: str = Query(..., description=f"種目（{', '.join(FITNESS_METRICS)}）"),
+    value: float = Query(...),
+    db: Session = Depends(get_db),
+):
+    """値が学年コホート内で何パーセンタイルか（種目の向きを考慮）"""
+    if metric not in FITNESS_METRICS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Invalid metric: {metric}. Valid values: {FITNESS_METRICS}",
+        )
+    cohort_percentiles.ensure_built(db)
+    percentile, size = cohort_percentiles.percentile(grade, metric, value)
+    return MetricPercentile(
+        grade=grade, metric=metric, value=value, percentile=percentile, cohort_size=size
+    )
+
+
+@router.get("/stats/percentiles/users/{user_id}", response_model=UserPercentilesResponse)
+def read_user_percentiles(user_id: uuid.UUID, db: Session = Depends(get_db)):
+    """ユーザーの最新測定結果について、学年内パーセンタイルを種目ごとに返す"""
+    row = (
+        db.query(models.UserResult, models.User.grade)
+        .join(models.User, models.UserResult.user_id == models.User.id)
+        .filter(models.UserResult.user_id == user_id)
+        .order_by(models.UserResult.date.desc(), models.UserResult.id.desc())
+        .first()
+    )
+    if row is None:
+        raise HTTPException(status_code=404, detail="Results not found")
+    result, grade = row
+    cohort_percentiles.ensure_built(db)
+    metrics = []
+    for metric in FITNESS_METRICS:
+        value = getattr(result, metric)
+        percentile, size = cohort_percentiles.percentile(grade, metric, value)
+        metrics.append(MetricPercentile(
+            grade=grade, metric=metric, value=value, percentile=percentile, cohort_size=size
+        ))
+    return UserPercentilesResponse(
+        user_id=user_id, grade=grade, date=result.date, metrics=metrics
+    )
+
+
+@router.get("/stats/trends", response_model=List[AthleteTrend])
+def read_trends(
+    grade: str,
+    window: int = Query(3, ge=1, le=50, description="改善率の比較に使う直近の回数"),
+    plateau_pct: float = Query(1.0, ge=0, description="この割合（%）以内の変化を横ばいとみなす"),
+    metrics: Optional[str] = None,
+    db: Session = Depends(get_db),
+):
+    """学年全員の種目別の推移（回帰の傾き・直近の改善率・自己ベスト）
+
+    1クエリで学年の全結果を (user_id, date, id) 順に取得し、NumPy でまとめて集計する。
+    metrics=long_jump_cm,... で返す種目を絞れる。
+    """
+    names = metrics.split(",") if metrics else FITNESS_METRICS
+    unknown = [n for n in names if n not in FITNESS_METRICS]
+    if unknown:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unknown metrics: {unknown}. Valid values: {FITNESS_METRICS}",
+        )
+    columns = [getattr(models.UserResult, m) for m in FITNESS_METRICS]
+    rows = db.execute(
+        select(models.UserResult.user_id, models.User.name, models.UserResult.date, *columns)
+        .join(models.User, models.UserResult.user_id == models.User.id)
+        .where(grade_filter(grade))
+        .order_by(models.UserResult.user_id, models.UserResult.date, models.UserResult.id)
+    ).all()
+    if not rows:
+        return []
+
+    user_ids = np.array([row[0] for row in rows], dtype=object)
+    dates = np.array([row[2] for row in rows], dtype="datetime64[D]")
+    values = np.array([row[3:] for row in rows], dtype=np.float64)
+    # 行は user_id 順なので、隣接行の比較で選手の区切りが分かる
+    codes = np.cumsum(np.r_[False, user_ids[1:] != user_ids[:-1]])
+    trends = athlete_trends(codes, dates, values, window)
+
+    def _round(v: float) -> Optional[float]:
+        return None if np.isnan(v) else round(float(v), 3) + 0.0  # -0.0 を 0.0 にする
+
+    athletes = []
+    for i, (start, count) in enumerate(zip(trends["starts"], trends["counts"])):
+        last = start + count - 1
+        athlete_metrics = {}
+        for j, metric in enumerate(FITNESS_METRICS):
+            if metric not in names:
+                continue
+            improvement = trends["improvement_pct"][i, j]
+            athlete_metrics[metric] = MetricTrend(
+                slope_per_year=_round(trends["slope_per_year"][i, j]),
+                improvement_pct=_round(improvement),
+                personal_best=trends["personal_best"][i, j],
+                personal_best_date=rows[trends["personal_best_index"][i, j]].date,
+                latest=values[last, j],
+                trend=classify(improvement, plateau_pct),
+            )
+        athletes.append(AthleteTrend(
+            user_id=rows[start].user_id,
+            name=rows[start].name,
+            result_count=int(count),
+            first_date=rows[start].date,
+            last_date=rows[last].date,
+            metrics=athlete_metrics,
+        ))
+    return athletes
+
+
+@router.get("/stats/leaderboard", response_model=Leaderboard)
+def read_leaderboard(
+    grade: str,
+    metric: str,
+    serfece: Optional[int] = None,
+    test_format: Optional[int] = None,
+    limit: int = Query(10, ge=1, le=100),
+    db: Session = Depends(get_db),
+):
+    """学年 × 種目の自己ベスト上位（serfece / test_format で条件を絞れる）"""
+    if metric not in FITNESS_METRICS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Invalid metric: {metric}. Valid values: {FITNESS_METRICS}",
+        )
+    for value, enum_type in ((serfece, SurfaceType), (test_format, TestFormat)):
+        if value is not None and value not in {e.value for e in enum_type}:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Invalid {enum_type.__name__} value: {value}. "
+                f"Valid values: {[e.value for e in enum_type]}",
+            )
+    board = leaderboards.board(
+        db, grade, metric,
+        serfece if serfece is not None else ANY,
+        test_format if test_format is not None else ANY,
+    )
+    top = board.top(limit)
+    # 名前は変わりうるため、上位の選手分だけ主キーで引く
+    names = dict(
+        db.query(models.User.id, models.User.name)
+        .filter(models.User.id.in_([user_id for _, user_id, _, _ in top]))
+        .all()
+    ) if top else {}
+    return Leaderboard(
+        grade=grade,
+        metric=metric,
+        serfece=serfece,
+        test_format=test_format,
+        athlete_count=len(board),
+        entries=[
+            LeaderboardEntry(rank=rank, user_id=user_id, name=names.get(user_id), value=value, date=date)
+            for rank, user_id, value, date in top
+        ],
+    )
+
+
+@router.get("/stats/breakdowns", response_model=List[CohortBreakdown])
+def read_breakdowns(
+    grade: Optional[str] = None,
+    serfece: Optional[int] = None,
+    test_format: Optional[int] = None,
+    db: Session = Depends(get_db),
+):
+    """学年 × サーフェス × テスト形式ごとの件数・平均・標準偏差・p50 / p90
+
+    集計は SQL の GROUP BY とウィンドウ関数で行う。grade / serfece / test_format で絞れる。
+    """
+    return breakdowns(db, grade=grade, serfece=serfece, test_format=test_format)
@@ -1,10 +1,12 @@
-from fastapi import APIRouter, HTTPException, Depends
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, HTTPException, Depends, Request
+from sqlalchemy.orm import Session, contains_eager
+from ..cache import conditional_response
 from ..deps import get_db
 from .. import models
 from ..schemas import (
     TrainingCreate,
     TrainingRead,
+    TrainingSeries,
     UserTrainingResultCreate,
     UserTrainingResultRead,
     UserTrainingResultWithTraining,
@@ -16,30 +18,40 @@ from ..schemas import (
 )
 from typing import List, Optional, Dict
 from ..enums import TrainingType, AchievementLevel
+from ..training_catalog import get_training_catalog, invalidate_training_catalog
 import uuid
 
 router = APIRouter()
 
 
 @router.get("/trainings/", response_model=List[TrainingRead])
-def read_trainings(training_type: Optional[int] = None, db: Session = Depends(get_db)):
-    """全トレーニングを取得（training_typeでフィルタリング可能）"""
-    query = db.query(models.Training)
-    if training_type is not None:
-        query = query.filter(models.Training.training_type == training_type)
-    trainings = query.all()
-    return trainings
+def read_trainings(
+    request: Request, training_type: Optional[int] = None, db: Session = Depends(get_db)
+):
+    """全トレーニングを取得（training_typeでフィルタリング可能、ETag / 304 対応）"""
+    catalog = get_training_catalog(db)
+    return conditional_response(request, *catalog.listing(training_type))
+
+
+@router.get("/training-series", response_model=List[TrainingSeries])
+def read_training_series(
+    request: Request, training_type: Optional[int] = None, db: Session = Depends(get_db)
+):
+    """シリーズ（ウォームアップ・クールダウンなど）ごとにページ順でまとめたトレーニング
+
+    series_name の無いトレーニングは含めない。ETag / 304 対応。
+    """
+    catalog = get_training_catalog(db)
+    return conditional_response(request, *catalog.series_listing(training_type))
 
 
 @router.get("/trainings/{training_id}", response_model=TrainingRead)
-def read_training(training_id: int, db: Session = Depends(get_db)):
-    """特定のトレーニングを取得"""
-    training = (
-        db.query(models.Training).filter(models.Training.id == training_id).first()
-    )
-    if training is None:
+def read_training(training_id: int, request: Request, db: Session = Depends(get_db)):
+    """特定のトレーニングを取得（ETag / 304 対応）"""
+    rendered = get_training_catalog(db).by_id.get(training_id)
+    if rendered is None:
         raise HTTPException(status_code=404, detail="Training not found")
-    return training
+    return conditional_response(request, *rendered)
 
 
 @router.post("/trainings/", response_model=TrainingRead)
@@ -58,6 +70,7 @@ def create_training(training: TrainingCreate, db: Session = Depends(get_db)):
     db.add(db_training)
     db.commit()
     db.refresh(db_training)
+    invalidate_training_catalog()
     return db_training
 
 
@@ -86,6 +99,7 @@ def update_training(
         setattr(db_training, key, value)
     db.commit()
     db.refresh(db_training)
+    invalidate_training_catalog()
     return db_training
 
 
@@ -99,6 +113,7 @@ def delete_training(training_id: int, db: Session = Depends(get_db)):
         raise HTTPException(status_code=404, detail="Training not found")
     db.delete(db_training)
     db.commit()
+    invalidate_training_catalog()
     return {"message": "Training deleted successfully"}
 
 
@@ -248,6 +263,7 @@ def read_user_training_summary(
         raise HTTPException(status_code=404, detail="User not found")
 
     # trainings と user_training_results を JOIN し、ユーザーの全結果を取得
+    # （training は JOIN 結果から読み込み、行ごとの遅延ロードを避ける）
     # 後続の処理で「トレーニングごとに最新1件」に絞り込む
     joined_results: List[models.UserTrainingResult] = (
         db.query(models.UserTrainingResult)
@@ -255,6 +271,7 @@ def read_user_training_summary(
             models.Training,
             models.UserTrainingResult.training_id == models.Training.id,
         )
+        .options(contains_eager(models.UserTrainingResult.training))
         .filter(models.UserTrainingResult.user_id == user_id)
         .order_by(
             models.UserTrainingResult.training_id,
@@ -1,101 +1,572 @@
+import datetime
+import json
+import os
 import uuid
-from fastapi import APIRouter, HTTPException, Depends
-from sqlalchemy.orm import Session
-from ..deps import get_db
-from .. import models
+import numpy as np
+from fastapi import APIRouter, HTTPException, Depends, Query, Request, Response
+from fastapi.responses import JSONResponse
+from pydantic import TypeAdapter, ValidationError
+from sqlalchemy import func, insert, select, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import aliased, selectinload
+from sqlalchemy.orm.attributes import set_committed_value
+from ..deps import get_async_db, user_identity_cache
+from ..pagination import NEXT_CURSOR_HEADER, decode_cursor, encode_cursor
+from .. import models, result_events
+from ..analytics import grade_stats, leaderboards, outliers
+from ..analytics.grade_data import get_grade_data
+from ..analytics.scores import cohort_scores, normalized_scores, to_list
 from ..enums import SurfaceType, TestFormat
-from ..schemas import UserCreate, UserRead, UserUpdate, UserResultCreate, UserResultRead
-from typing import List
+from ..fieldsets import UserFieldset, user_fieldset
+from ..metrics import FITNESS_METRICS, RESULT_ATTRIBUTES
+from ..schemas import (
+    MetricComparison,
+    UserComparison,
+    UserCreate,
+    UserRead,
+    UserScoreHistory,
+    UserScores,
+    UserUpdate,
+    UserResultBulkError,
+    UserResultBulkResponse,
+    UserResultColumns,
+    UserResultCreate,
+    UserResultRead,
+)
+from typing import List, Optional
 
 router = APIRouter()
 
 
+async def _get_user(db: AsyncSession, user_id: uuid.UUID, with_results: bool = True):
+    stmt = select(models.User).filter(models.User.id == user_id)
+    if with_results:
+        # 非同期セッションでは遅延ロードできないため results を先読みする
+        stmt = stmt.options(selectinload(models.User.results))
+    return (await db.execute(stmt)).scalars().first()
+
+
 @router.post("/users/", response_model=UserRead)
-async def create_user(user: UserCreate, db: Session = Depends(get_db)):
-    db_user = models.User(**user.dict())
+async def create_user(user: UserCreate, db: AsyncSession = Depends(get_async_db)):
+    db_user = models.User(**user.dict(), results=[])
     db.add(db_user)
-    db.commit()
-    db.refresh(db_user)
+    await db.commit()
     return db_user
 
 
 @router.put("/users/{user_id}", response_model=UserRead)
-async def update_user(user_id: uuid.UUID, payload: UserUpdate, db: Session = Depends(get_db)):
-    user = db.query(models.User).filter(models.User.id == user_id).first()
+async def update_user(
+    user_id: uuid.UUID,
+    payload: UserUpdate,
+    db: AsyncSession = Depends(get_async_db),
+    fieldset: Optional[UserFieldset] = Depends(user_fieldset),
+):
+    user = await _get_user(db, user_id, with_results=fieldset is None or fieldset.wants_results)
     if user is None:
         raise HTTPException(status_code=404, detail="User not found")
+    old_grade = user.grade
     data = payload.dict(exclude_unset=True)
     for k, v in data.items():
         setattr(user, k, v)
-    db.commit()
-    db.refresh(user)
-    if not user.results:
-        user.results = []
+    if "grade" in data:
+        await db.flush()
+        await db.run_sync(grade_stats.move_user, user.id, old_grade, user.grade)
+    await db.commit()
+    if user.firebase_uid:
+        user_identity_cache.invalidate(user.firebase_uid)
+    result_events.user_grade_changed(user.id, old_grade, user.grade)
+    if fieldset is not None:
+        return JSONResponse(content=fieldset.serialize(user))
     return user
 
 
 @router.get("/users/{user_id}", response_model=UserRead)
-async def read_user(user_id: uuid.UUID, db: Session = Depends(get_db)):
-    user = db.query(models.User).filter(models.User.id == user_id).first()
+async def read_user(
+    user_id: uuid.UUID,
+    db: AsyncSession = Depends(get_async_db),
+    fieldset: Optional[UserFieldset] = Depends(user_fieldset),
+):
+    """ユーザー取得（fields= / include= で返す項目を絞れる）"""
+    user = await _get_user(db, user_id, with_results=fieldset is None or fieldset.wants_results)
     if user is None:
         raise HTTPException(status_code=404, detail="User not found")
-    if not user.results:
-        user.results = []
+    if fieldset is not None:
+        return JSONResponse(content=fieldset.serialize(user))
     return user
 
 
+async def _load_latest_results(db: AsyncSession, users: list, per_user: int) -> None:
+    """各ユーザーの results を新しい順に per_user 件までに絞って1クエリで読み込む"""
+    by_user = {user.id: [] for user in users}
+    if per_user > 0 and by_user:
+        ranked = (
+            select(
+                models.UserResult,
+                func.row_number().over(
+                    partition_by=models.UserResult.user_id,
+                    order_by=(models.UserResult.date.desc(), models.UserResult.id.desc()),
+                ).label("rn"),
+            )
+            .filter(models.UserResult.user_id.in_(list(by_user)))
+            .subquery()
+        )
+        result_alias = aliased(models.UserResult, ranked)
+        stmt = (
+            select(result_alias)
+            .filter(ranked.c.rn <= per_user)
+            .order_by(ranked.c.user_id, ranked.c.date)
+        )
+        for result in (await db.execute(stmt)).scalars():
+            by_user[result.user_id].append(result)
+    for user in users:
+        set_committed_value(user, "results", by_user[user.id])
+
+
 @router.get("/users/", response_model=List[UserRead])
-async def read_users(db: Session = Depends(get_db), skip: int = 0, limit: int = 100):
-    users = db.query(models.User).offset(skip).limit(limit).all()
+async def read_users(
+    response: Response,
+    db: AsyncSession = Depends(get_async_db),
+    skip: int = 0,
+    limit: int = Query(100, ge=1, le=500),
+    cursor: Optional[str] = None,
+    include_results: bool = True,
+    results_limit: Optional[int] = Query(None, ge=0),
+):
+    """ユーザー一覧（(name, id) 順のキーセットページング）
+
+    - 次ページがある場合は X-Next-Cursor ヘッダのカーソルを `cursor` に渡す
+    - `skip` は後方互換のため残しているが、`cursor` 指定時は無視する
+    - include_results=false で results を空にし、results_limit で各ユーザーの
+      最新 N 件に絞る。いずれの場合もクエリ数はページサイズに依存しない
+    """
+    stmt = (
+        select(models.User)
+        .order_by(models.User.name, models.User.id)
+        .limit(limit)
+    )
+    if cursor:
+        last_name, last_id = decode_cursor(cursor, 2)
+        try:
+            last_uuid = uuid.UUID(last_id)
+        except (TypeError, ValueError):
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+        stmt = stmt.filter(
+            tuple_(models.User.name, models.User.id) > tuple_(last_name, last_uuid)
+        )
+    elif skip:
+        stmt = stmt.offset(skip)
+    if include_results and results_limit is None:
+        stmt = stmt.options(selectinload(models.User.results))
+
+    users = (await db.execute(stmt)).scalars().all()
+    if not include_results:
+        await _load_latest_results(db, users, 0)
+    elif results_limit is not None:
+        await _load_latest_results(db, users, results_limit)
+
+    if len(users) == limit:
+        last = users[-1]
+        response.headers[NEXT_CURSOR_HEADER] = encode_cursor([last.name, last.id])
     return users
 
 
-@router.post("/user_results/", response_model=UserResultRead)
-async def create_user_result(user_result: UserResultCreate, db: Session = Depends(get_db)):
-    result_data = user_result.dict()
-    # Enumの値が数値のため、そのまま使用（バリデーションは必要に応じて追加可能）
-    # 数値が有効なEnum値かチェック
+def _invalid_enum_message(result_data: dict) -> Optional[str]:
+    """serfece / test_format が有効な Enum 値でなければエラーメッセージを返す"""
+    # Enumの値が数値のため、数値が有効なEnum値かチェック
     if result_data.get("serfece") is not None:
         try:
             SurfaceType(result_data["serfece"])  # バリデーション
         except ValueError:
-            raise HTTPException(
-                status_code=400,
-                detail=f"Invalid serfece value: {result_data['serfece']}. Valid values: {[e.value for e in SurfaceType]}"
-            )
+            return f"Invalid serfece value: {result_data['serfece']}. Valid values: {[e.value for e in SurfaceType]}"
     if result_data.get("test_format") is not None:
         try:
             TestFormat(result_data["test_format"])  # バリデーション
         except ValueError:
-            raise HTTPException(
-                status_code=400,
-                detail=f"Invalid test_format value: {result_data['test_format']}. Valid values: {[e.value for e in TestFormat]}"
-            )
+            return f"Invalid test_format value: {result_data['test_format']}. Valid values: {[e.value for e in TestFormat]}"
+    return None
+
+
+@router.post("/user_results/", response_model=UserResultRead)
+async def create_user_result(
+    user_result: UserResultCreate,
+    force: bool = Query(False, description="外れ値の疑いがあっても確認済みとして登録する"),
+    db: AsyncSession = Depends(get_async_db),
+):
+    result_data = user_result.dict()
+    message = _invalid_enum_message(result_data)
+    if message:
+        raise HTTPException(status_code=400, detail=message)
     # Map _25m_run to the actual column name
     if "_25m_run" in result_data:
         result_data["_25m_run"] = result_data.pop("_25m_run")
+    grade = (
+        await db.execute(select(models.User.grade).filter(models.User.id == result_data["user_id"]))
+    ).first()
+    if grade is None:
+        raise HTTPException(status_code=404, detail="User not found")
+    if outliers.enabled() and not force:
+        anomaly = (await db.run_sync(outliers.check_rows, [(result_data, grade[0])]))[0]
+        if anomaly and outliers.OUTLIER_MODE == "hold":
+            raise HTTPException(
+                status_code=422,
+                detail=f"Suspicious value: {anomaly}. Resubmit with force=true if it is correct.",
+            )
+        result_data["anomaly"] = anomaly
     db_user_result = models.UserResult(**result_data)
     db.add(db_user_result)
-    db.commit()
-    db.refresh(db_user_result)
+    if result_data.get("anomaly"):
+        # 確認待ちの行は confirm されるまで集計に含めない
+        await db.commit()
+        return db_user_result
+    # total_score の集計クエリに新しい行を含めるため、集計の更新前に INSERT する
+    await db.flush()
+    await db.run_sync(grade_stats.apply, [(grade[0], grade_stats.values_of(result_data))])
+    await db.run_sync(leaderboards.apply, [result_data])
+    await db.commit()
+    result_events.results_added([result_events.result_row(db_user_result, grade[0])])
     return db_user_result
 
 
+@router.post("/user_results/{result_id}/confirm", response_model=UserResultRead)
+async def confirm_user_result(result_id: int, db: AsyncSession = Depends(get_async_db)):
+    """外れ値の疑いで確認待ちの結果を確認済みにし、集計に含める"""
+    row = (
+        await db.execute(
+            select(models.UserResult, models.User.grade)
+            .join(models.User, models.UserResult.user_id == models.User.id)
+            .filter(models.UserResult.id == result_id)
+        )
+    ).first()
+    if row is None:
+        raise HTTPException(status_code=404, detail="Result not found")
+    result, grade = row
+    if result.anomaly is None:
+        return result
+    result.anomaly = None
+    await db.flush()
+    confirmed = result_events.result_row(result, grade)
+    await db.run_sync(grade_stats.apply, [(grade, grade_stats.values_of(confirmed))])
+    await db.run_sync(leaderboards.apply, [confirmed])
+    await db.commit()
+    result_events.results_added([confirmed])
+    return result
+
+
+BULK_MAX_ROWS = int(os.getenv("USER_RESULTS_BULK_MAX_ROWS", "5000"))
+_user_result_adapter = TypeAdapter(UserResultCreate)
+
+
+def _too_many_rows(count: int) -> HTTPException:
+    return HTTPException(status_code=413, detail=f"Too many rows: {count} (max {BULK_MAX_ROWS})")
+
+
+async def _read_bulk_rows(request: Request) -> list:
+    """JSON 配列または NDJSON（1行1件）のリクエストボディを読み込む
+
+    NDJSON は BULK_MAX_ROWS 行を超えた時点で読み込みをやめて 413 を返す。
+    """
+    content_type = request.headers.get("content-type", "")
+    if "ndjson" in content_type or "jsonlines" in content_type:
+        rows = []
+        # 改行を含まないチャンク（行の途中）はリストに溜め、改行が来たときに連結する
+        pending: List[bytes] = []
+        async for chunk in request.stream():
+            *lines, rest = chunk.split(b"\n")
+            if lines:
+                lines[0] = b"".join(pending) + lines[0]
+                pending = []
+                rows.extend(line for line in lines if line.strip())
+                if len(rows) > BULK_MAX_ROWS:
+                    raise _too_many_rows(len(rows))
+            if rest:
+                pending.append(rest)
+        last = b"".join(pending)
+        if last.strip():
+            rows.append(last)
+        return rows
+    try:
+        rows = json.loads(await request.body())
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Body must be a JSON array or NDJSON")
+    if not isinstance(rows, list):
+        raise HTTPException(status_code=400, detail="Body must be a JSON array or NDJSON")
+    return rows
+
+
+@router.post("/user_results/bulk", response_model=UserResultBulkResponse)
+async def create_user_results_bulk(
+    request: Request,
+    force: bool = Query(False, description="外れ値の疑いがあっても確認済みとして登録する"),
+    db: AsyncSession = Depends(get_async_db),
+):
+    """測定会用の一括登録（JSON 配列 または application/x-ndjson）
+
+    全行を1パスで検証し、有効な行だけを1トランザクションの executemany で
+    登録する。不正な行は errors に行番号付きで返し、バッチ全体は中断しない。
+    ids は登録した行の id の集合（昇順）で、入力の行とは対応しない。
+    外れ値の疑いがある行は flagged に返す。flag モードでは確認待ちとして登録し
+    （集計には confirm まで含めない）、hold モードでは登録しない。
+    """
+    raw_rows = await _read_bulk_rows(request)
+    if len(raw_rows) > BULK_MAX_ROWS:
+        raise _too_many_rows(len(raw_rows))
+
+    errors: List[UserResultBulkError] = []
+    valid: list = []
+    for index, raw in enumerate(raw_rows):
+        try:
+            if isinstance(raw, bytes):  # NDJSON の1行
+                row = _user_result_adapter.validate_json(raw)
+            else:
+                row = _user_result_adapter.validate_python(raw)
+        except ValidationError as e:
+            message = "; ".join(
+                f"{'.'.join(str(part) for part in err['loc']) or 'row'}: {err['msg']}"
+                for err in e.errors()
+            )
+            errors.append(UserResultBulkError(index=index, error=message))
+            continue
+        result_data = row.model_dump()
+        message = _invalid_enum_message(result_data)
+        if message:
+            errors.append(UserResultBulkError(index=index, error=message))
+            continue
+        valid.append((index, result_data))
+
+    # 存在しないユーザーの行は外部キー違反でバッチ全体が失敗するため事前に除外する
+    user_ids = {data["user_id"] for _, data in valid}
+    grades = {}
+    if user_ids:
+        grades = dict(
+            (await db.execute(
+                select(models.User.id, models.User.grade).filter(models.User.id.in_(user_ids))
+            )).all()
+        )
+    known = []
+    for index, data in valid:
+        if data["user_id"] not in grades:
+            errors.append(UserResultBulkError(index=index, error=f"User not found: {data['user_id']}"))
+            continue
+        known.append((index, data))
+
+    flagged: List[UserResultBulkError] = []
+    params = []
+    anomalies = [None] * len(known)
+    if known and outliers.enabled() and not force:
+        # 学年の統計はキャッシュ、選手の履歴はバッチ全体で1クエリ
+        anomalies = await db.run_sync(
+            outliers.check_rows, [(data, grades[data["user_id"]]) for _, data in known]
+        )
+    for (index, data), anomaly in zip(known, anomalies):
+        if anomaly:
+            flagged.append(UserResultBulkError(index=index, error=f"Suspicious value: {anomaly}"))
+            if outliers.OUTLIER_MODE == "hold":
+                errors.append(flagged[-1])
+                continue
+        data["anomaly"] = anomaly
+        params.append(data)
+
+    ids: List[int] = []
+    if params:
+        # ORM の一括 INSERT + RETURNING は SQLite では1行ずつの INSERT になるため、
+        # テーブルに対する Core の INSERT（insertmanyvalues で数文にまとまる）を使う
+        table = models.UserResult.__table__
+        rows = [
+            {("25m_run" if key == "_25m_run" else key): value for key, value in data.items()}
+            for data in params
+        ]
+        stmt = insert(table).returning(table.c.id)
+        ids = list((await db.execute(stmt, rows)).scalars())
+        # 確認待ちの行は登録するが、confirm されるまで集計に含めない
+        counted = [data for data in params if not data.get("anomaly")]
+        await db.run_sync(
+            grade_stats.apply,
+            [(grades[data["user_id"]], grade_stats.values_of(data)) for data in counted],
+        )
+        await db.run_sync(leaderboards.apply, counted)
+        await db.commit()
+        # RETURNING の順序は保証しない（sort_by_parameter_order は SQLite で1行ずつの
+        # INSERT になる）ため、イベントの行には id を付けず、ids も入力順にしない
+        ids.sort()
+        result_events.results_added(
+            result_events.result_row(data, grades[data["user_id"]]) for data in counted
+        )
+
+    errors.sort(key=lambda e: e.index)
+    return UserResultBulkResponse(inserted=len(ids), ids=ids, errors=errors, flagged=flagged)
+
+
 @router.delete("/user_results/{result_id}")
-async def delete_user_result(result_id: int, db: Session = Depends(get_db)):
-    result = db.query(models.UserResult).filter(
-        models.UserResult.id == result_id).first()
-    if result is None:
+async def delete_user_result(result_id: int, db: AsyncSession = Depends(get_async_db)):
+    row = (
+        await db.execute(
+            select(models.UserResult, models.User.grade)
+            .join(models.User, models.UserResult.user_id == models.User.id)
+            .filter(models.UserResult.id == result_id)
+        )
+    ).first()
+    if row is None:
         raise HTTPException(status_code=404, detail="Result not found")
-    db.delete(result)
-    db.commit()
+    result, grade = row
+    deleted = result_events.result_row(result, grade)
+    await db.delete(result)
+    if result.anomaly is not None:
+        # 確認待ちの行は集計に含まれていない
+        await db.commit()
+        return {"message": "Result deleted successfully"}
+    await db.flush()
+    await db.run_sync(grade_stats.apply, (), [(grade, grade_stats.values_of(deleted))])
+    await db.run_sync(leaderboards.apply, (), [deleted])
+    await db.commit()
+    result_events.result_deleted(deleted)
     return {"message": "Result deleted successfully"}
 
 
 @router.get("/user_results/{user_id}", response_model=List[UserResultRead])
-async def read_user_results(user_id: uuid.UUID, db: Session = Depends(get_db)):
-    results = db.query(models.UserResult).filter(
-        models.UserResult.user_id == user_id).all()
-    if not results:
-        raise HTTPException(status_code=404, detail="Results not found")
-    return results
+async def read_user_results(
+    user_id: uuid.UUID,
+    response: Response,
+    db: AsyncSession = Depends(get_async_db),
+    date_from: Optional[datetime.date] = Query(None, alias="from"),
+    date_to: Optional[datetime.date] = Query(None, alias="to"),
+    limit: Optional[int] = Query(None, ge=1, le=1000),
+    cursor: Optional[str] = None,
+    format: str = Query("rows", pattern="^(rows|columnar)$"),
+    metrics: Optional[str] = None,
+):
+    """ユーザーの測定結果（日付の古い順）
+
+    - from / to: 測定日の範囲（両端を含む）
+    - limit / cursor: (date, id) のキーセットページング。次ページは X-Next-Cursor
+    - format=columnar: 種目ごとの配列で返す（グラフ用）。metrics=long_jump_cm,...
+      で種目を絞ると、その列だけを取得する
+    """
+    columnar = format == "columnar"
+    if columnar:
+        names = metrics.split(",") if metrics else list(RESULT_ATTRIBUTES)
+        unknown = [n for n in names if n not in RESULT_ATTRIBUTES]
+        if unknown:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Unknown metrics: {unknown}. Valid values: {list(RESULT_ATTRIBUTES)}",
+            )
+        columns = [getattr(models.UserResult, RESULT_ATTRIBUTES[n]) for n in names]
+        stmt = select(models.UserResult.id, models.UserResult.date, *columns)
+    else:
+        stmt = select(models.UserResult)
+
+    # ORDER BY は idx_user_results_user_date (user_id, date) で解決される
+    stmt = stmt.filter(models.UserResult.user_id == user_id).order_by(
+        models.UserResult.date, models.UserResult.id
+    )
+    if date_from is not None:
+        stmt = stmt.filter(models.UserResult.date >= date_from)
+    if date_to is not None:
+        stmt = stmt.filter(models.UserResult.date <= date_to)
+    if cursor:
+        last_date, last_id = decode_cursor(cursor, 2)
+        try:
+            last_key = (datetime.date.fromisoformat(last_date), int(last_id))
+        except (TypeError, ValueError):
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+        stmt = stmt.filter(
+            tuple_(models.UserResult.date, models.UserResult.id) > tuple_(*last_key)
+        )
+    if limit is not None:
+        stmt = stmt.limit(limit)
+
+    result = await db.execute(stmt)
+    rows = result.all() if columnar else result.scalars().all()
+
+    next_cursor = None
+    if limit is not None and len(rows) == limit:
+        next_cursor = encode_cursor([rows[-1].date.isoformat(), rows[-1].id])
+        response.headers[NEXT_CURSOR_HEADER] = next_cursor
+
+    if columnar:
+        body = UserResultColumns(
+            user_id=user_id,
+            ids=[row.id for row in rows],
+            dates=[row.date for row in rows],
+            metrics={name: [row[i + 2] for row in rows] for i, name in enumerate(names)},
+        )
+        headers = {NEXT_CURSOR_HEADER: next_cursor} if next_cursor else None
+        return JSONResponse(content=body.model_dump(mode="json"), headers=headers)
+    return rows
+
+
+@router.get("/users/{user_id}/comparison", response_model=UserComparison)
+async def read_user_comparison(user_id: uuid.UUID, db: AsyncSession = Depends(get_async_db)):
+    """最新の測定結果・学年平均・学年最高と、全履歴の正規化スコアを1回で返す"""
+    grade = (
+        await db.execute(select(models.User.grade).filter(models.User.id == user_id))
+    ).first()
+    if grade is None:
+        raise HTTPException(status_code=404, detail="User not found")
+    grade = grade[0] or ""
+    columns = [getattr(models.UserResult, m) for m in FITNESS_METRICS]
+    rows = (
+        await db.execute(
+            select(models.UserResult.id, models.UserResult.date, *columns)
+            .filter(models.UserResult.user_id == user_id)
+            .order_by(models.UserResult.date, models.UserResult.id)
+        )
+    ).all()
+    reference = (await db.run_sync(get_grade_data)).by_grade.get(grade)
+    average = reference.average if reference is not None else None
+    best = reference.max if reference is not None else None
+    average_values = {m: getattr(average, m) if average else None for m in FITNESS_METRICS}
+    best_values = {m: getattr(best, m) if best else None for m in FITNESS_METRICS}
+
+    values = np.array([row[2:] for row in rows], dtype=np.float64).reshape(-1, len(FITNESS_METRICS))
+    scores = normalized_scores(values, best_values)
+    average_scores = normalized_scores(
+        [np.nan if average_values[m] is None else average_values[m] for m in FITNESS_METRICS],
+        best_values,
+    )[0]
+
+    metrics = []
+    for j, metric in enumerate(FITNESS_METRICS):
+        metrics.append(MetricComparison(
+            metric=metric,
+            value=float(values[-1, j]) if rows else None,
+            average=average_values[metric],
+            max=best_values[metric],
+            score=to_list(scores[-1:, j])[0] if rows else None,
+            average_score=to_list(average_scores[j:j + 1])[0],
+        ))
+    return UserComparison(
+        user_id=user_id,
+        grade=grade,
+        date=rows[-1].date if rows else None,
+        metrics=metrics,
+        history=UserScoreHistory(
+            ids=[row.id for row in rows],
+            dates=[row.date for row in rows],
+            scores={m: to_list(scores[:, j]) for j, m in enumerate(FITNESS_METRICS)},
+        ),
+    )
+
+
+@router.get("/users/{user_id}/scores", response_model=UserScores)
+async def read_user_scores(user_id: uuid.UUID, db: AsyncSession = Depends(get_async_db)):
+    """全測定結果の学年内 T スコアと合計スコア"""
+    grade = (
+        await db.execute(select(models.User.grade).filter(models.User.id == user_id))
+    ).first()
+    if grade is None:
+        raise HTTPException(status_code=404, detail="User not found")
+    grade = grade[0] or ""
+    scores = await db.run_sync(cohort_scores.for_grade, grade)
+    idx = scores.for_user(user_id)
+    return UserScores(
+        user_id=user_id,
+        grade=grade,
+        cohort_size=len(scores),
+        ids=scores.ids[idx].tolist(),
+        dates=scores.dates[idx].tolist(),
+        t_scores={m: to_list(scores.t[idx, j]) for j, m in enumerate(FITNESS_METRICS)},
+        total_scores=to_list(scores.total[idx]),
+        grade_average_total=scores.mean_total,
+        grade_max_total=scores.max_total,
+    )
@@ -1,6 +1,6 @@
 import datetime
 import uuid
-from typing import List, Optional
+from typing import Dict, List, Optional
 from pydantic import BaseModel, Field
 
 
@@ -41,6 +41,7 @@ class UserResultRead(BaseModel):
     _25m_run: Optional[float] = None
     serfece: Optional[int] = None  # 1: 人工芝, 2: ハード, 3: クレー
     test_format: Optional[int] = None  # 1: 全国大会, 2: 地域大会
+    anomaly: Optional[str] = None  # 外れ値の疑いがあれば理由
 
     class Config:
         from_attributes = True  # Pydantic V2
@@ -66,17 +67,49 @@ class UserResultRead(BaseModel):
         return self.ball_throw_cm / 100.0
 
 
-class UserRead(BaseModel):
+class UserProfile(BaseModel):
+    """results を含まないユーザー情報"""
+
     id: uuid.UUID
     name: str
     grade: str
     birthday: Optional[datetime.date] = None
-    results: List[UserResultRead]
 
     class Config:
         from_attributes = True  # Pydantic V2
 
 
+class UserResultColumns(BaseModel):
+    """測定結果の列形式レスポンス（種目ごとの配列、グラフ描画用）"""
+
+    user_id: uuid.UUID
+    ids: List[int]
+    dates: List[datetime.date]
+    metrics: Dict[str, List[Optional[float]]]
+
+
+class UserResultBulkError(BaseModel):
+    """一括登録で取り込めなかった行"""
+
+    index: int  # 入力の何行目か（0始まり）
+    error: str
+
+
+class UserResultBulkResponse(BaseModel):
+    """一括登録の結果（エラー行があっても他の行は登録される）"""
+
+    inserted: int
+    # 登録した行の id（昇順）。入力の行番号とは対応しない（RETURNING の順序は保証されない）
+    ids: List[int]
+    errors: List[UserResultBulkError]
+    # 外れ値の疑いがある行（RESULT_OUTLIER_MODE=flag では登録済み、hold では errors にも入る）
+    flagged: List[UserResultBulkError] = []
+
+
+class UserRead(UserProfile):
+    results: List[UserResultRead]
+
+
 class AverageDataBase(BaseModel):
     grade: str
     long_jump_cm: float
@@ -119,6 +152,136 @@ class MaxDataResponse(MaxDataBase):
         from_attributes = True
 
 
+class GradeData(BaseModel):
+    """学年ごとの平均値・最高記録（GET /stats/grades）"""
+
+    grade: str
+    average: Optional[AverageDataResponse] = None
+    max: Optional[MaxDataResponse] = None
+
+
+class MetricComparison(BaseModel):
+    """1種目の比較（スコアは学年の最高記録を 100 とした 0–100）"""
+
+    metric: str
+    value: Optional[float] = None
+    average: Optional[float] = None
+    max: Optional[float] = None
+    score: Optional[float] = None
+    average_score: Optional[float] = None
+
+
+class UserScoreHistory(BaseModel):
+    """全測定結果の種目別スコア（日付の古い順、列形式）"""
+
+    ids: List[int]
+    dates: List[datetime.date]
+    scores: Dict[str, List[Optional[float]]]
+
+
+class UserScores(BaseModel):
+    """学年コホート内の T スコア（種目別・合計、日付の古い順、列形式）"""
+
+    user_id: uuid.UUID
+    grade: str
+    cohort_size: int  # 学年の測定結果の件数
+    ids: List[int]
+    dates: List[datetime.date]
+    t_scores: Dict[str, List[float]]
+    total_scores: List[float]
+    grade_average_total: Optional[float] = None
+    grade_max_total: Optional[float] = None
+
+
+class UserComparison(BaseModel):
+    """最新の測定結果と学年平均・学年最高の比較（レーダーチャート用）"""
+
+    user_id: uuid.UUID
+    grade: str
+    date: Optional[datetime.date] = None  # 最新の測定日（結果が無ければ None）
+    metrics: List[MetricComparison]
+    history: UserScoreHistory
+
+
+class MetricTrend(BaseModel):
+    """1種目の推移（improvement_pct は正なら改善）"""
+
+    slope_per_year: Optional[float] = None
+    improvement_pct: Optional[float] = None
+    personal_best: float
+    personal_best_date: datetime.date
+    latest: float
+    trend: Optional[str] = None  # "improving" / "plateau" / "declining"
+
+
+class AthleteTrend(BaseModel):
+    """選手ごとの記録の推移"""
+
+    user_id: uuid.UUID
+    name: Optional[str] = None
+    result_count: int
+    first_date: datetime.date
+    last_date: datetime.date
+    metrics: Dict[str, MetricTrend]
+
+
+class LeaderboardEntry(BaseModel):
+    """リーダーボードの1行（選手の自己ベスト）"""
+
+    rank: int  # 同じ記録は同順位
+    user_id: uuid.UUID
+    name: Optional[str] = None
+    value: float
+    date: datetime.date
+
+
+class Leaderboard(BaseModel):
+    grade: str
+    metric: str
+    serfece: Optional[int] = None
+    test_format: Optional[int] = None
+    athlete_count: int
+    entries: List[LeaderboardEntry]
+
+
+class MetricBreakdown(BaseModel):
+    """1種目の分布（stddev は母集団、p50 / p90 は nearest-rank）"""
+
+    mean: float
+    stddev: float
+    p50: float
+    p90: float
+
+
+class CohortBreakdown(BaseModel):
+    """学年 × サーフェス × テスト形式ごとの集計"""
+
+    grade: str
+    serfece: Optional[int] = None
+    test_format: Optional[int] = None
+    count: int
+    metrics: Dict[str, MetricBreakdown]
+
+
+class MetricPercentile(BaseModel):
+    """学年コホート内でのパーセンタイル（0–100、大きいほど成績が良い）"""
+
+    grade: str
+    metric: str
+    value: float
+    percentile: Optional[float] = None  # コホートが空なら None
+    cohort_size: int
+
+
+class UserPercentilesResponse(BaseModel):
+    """ユーザーの最新測定結果の種目別パーセンタイル"""
+
+    user_id: uuid.UUID
+    grade: str
+    date: datetime.date
+    metrics: List[MetricPercentile]
+
+
 class TrainingBase(BaseModel):
     training_type: int  # TrainingType Enum
     title: str
@@ -145,6 +308,15 @@ class TrainingRead(TrainingBase):
         from_attributes = True
 
 
+class TrainingSeries(BaseModel):
+    """シリーズ（series_name, series_number）ごとのトレーニング（page_number 順）"""
+
+    training_type: int
+    series_name: str
+    series_number: Optional[int] = None
+    trainings: List[TrainingRead]
+
+
 class UserTrainingResultBase(BaseModel):
     user_id: uuid.UUID
     training_id: int
@@ -0,0 +1,106 @@
+"""
+トレーニング項目マスタ（trainings）のプロセス内スナップショット
+
+trainings は管理者が編集したときにしか変わらないため、全行を1クエリで読み、
+一覧（全件・training_type ごと）、1件ずつのレスポンス、シリーズごとにまとめた
+一覧（GET /training-series）をレンダリング済みの JSON と ETag で保持します。
+行は idx_trainings_series の順（training_type, series_name, series_number,
+page_number）で読むため、シリーズは連続する行をまとめるだけで作れます。
+
+ETag は本文のハッシュなので、どのワーカーでも同じ内容なら同じ値になり、
+内容が変わったとき（削除を含む）だけ変わります。
+
+trainings の作成・更新・削除で `invalidate_training_catalog()` し、他ワーカーでの
+更新は TRAINING_CATALOG_CACHE_TTL で反映されます。
+"""
+import itertools
+import os
+from collections import defaultdict
+from typing import Dict, List, Optional
+
+from sqlalchemy.orm import Session
+
+from . import models
+from .cache import TTLCache, make_etag
+from .schemas import TrainingRead, TrainingSeries
+
+TRAINING_CATALOG_CACHE_TTL = float(os.getenv("TRAINING_CATALOG_CACHE_TTL", "300"))
+training_catalog_cache = TTLCache(max_size=1, ttl_seconds=TRAINING_CATALOG_CACHE_TTL)
+_CATALOG_KEY = "trainings"
+
+
+def _render_list(items: List[bytes]):
+    body = b"[" + b",".join(items) + b"]"
+    return body, make_etag(body)
+
+
+def _series_key(t: TrainingRead):
+    return t.training_type, t.series_name, t.series_number
+
+
+class TrainingCatalog:
+    """trainings 全行のレンダリング済みレスポンス（一覧は id 順）"""
+
+    def __init__(self, trainings: List[models.Training]) -> None:
+        in_series_order = [TrainingRead.model_validate(t) for t in trainings]
+        series_by_type: Dict[int, List[bytes]] = defaultdict(list)
+        all_series: List[bytes] = []
+        for (training_type, series_name, series_number), pages in itertools.groupby(
+            (t for t in in_series_order if t.series_name is not None), key=_series_key
+        ):
+            body = TrainingSeries(
+                training_type=training_type,
+                series_name=series_name,
+                series_number=series_number,
+                trainings=list(pages),
+            ).model_dump_json().encode()
+            series_by_type[training_type].append(body)
+            all_series.append(body)
+        self.series = _render_list(all_series)
+        self.series_by_type = {
+            training_type: _render_list(items) for training_type, items in series_by_type.items()
+        }
+
+        self.trainings = sorted(in_series_order, key=lambda t: t.id)
+        rendered = [t.model_dump_json().encode() for t in self.trainings]
+        self.by_id = {
+            t.id: (body, make_etag(body)) for t, body in zip(self.trainings, rendered)
+        }
+        by_type: Dict[int, List[bytes]] = defaultdict(list)
+        for t, body in zip(self.trainings, rendered):
+            by_type[t.training_type].append(body)
+        self.all = _render_list(rendered)
+        self.by_type = {training_type: _render_list(items) for training_type, items in by_type.items()}
+        # 該当なしの training_type も空配列として 304 を返せるようにする
+        self.empty = _render_list([])
+
+    def listing(self, training_type: Optional[int] = None):
+        if training_type is None:
+            return self.all
+        return self.by_type.get(training_type, self.empty)
+
+    def series_listing(self, training_type: Optional[int] = None):
+        if training_type is None:
+            return self.series
+        return self.series_by_type.get(training_type, self.empty)
+
+
+def get_training_catalog(db: Session) -> TrainingCatalog:
+    catalog = training_catalog_cache.get(_CATALOG_KEY)
+    if catalog is None:
+        generation = training_catalog_cache.generation
+        # 破棄直後の読み込みは、編集が届いていないレプリカではなくプライマリから読む
+        db.use_replica = False
+        t = models.Training
+        catalog = TrainingCatalog(
+            db.query(t)
+            .order_by(t.training_type, t.series_name, t.series_number, t.page_number, t.id)
+            .all()
+        )
+        # 読み込み中に破棄されていたら編集前の内容かもしれないため保存しない
+        training_catalog_cache.set_if_current(_CATALOG_KEY, catalog, generation)
+    return catalog
+
+
+def invalidate_training_catalog() -> None:
+    training_catalog_cache.invalidate(_CATALOG_KEY)
@@ -0,0 +1,138 @@
+"""
+同期Session（旧実装）と AsyncSession（新実装）のレイテンシ比較ベンチマーク
+
+`async def` ルート内で同期 Session を使うとイベントループがブロックされ、
+同時リクエストが直列化されます。同じクエリ（ユーザー + results の取得）を
+両方式で実装した2つのルートに同時負荷をかけ、p50/p99 を比較します。
+
+使用方法:
+    pip install httpx
+    python scripts/bench/bench_async_routes.py --requests 2000 --concurrency 10
+
+DATABASE_URL が設定されていればそのDBを、なければ一時SQLiteを使用します。
+ネットワーク往復のある PostgreSQL で実行すると差がはっきり出ます
+（ローカルSQLiteはクエリが速すぎるため、aiosqlite のスレッド受け渡しの
+オーバーヘッドの方が目立つことがあります）。
+
+注意: 同期側は concurrency が DB_POOL_SIZE + DB_MAX_OVERFLOW を超えると、
+ブロックされたイベントループが接続を返却できず pool_timeout まで停止します
+（旧実装で実際に起きていたプール枯渇と同じ現象です）。
+"""
+import argparse
+import asyncio
+import datetime
+import os
+import statistics
+import sys
+import tempfile
+import time
+import uuid
+from pathlib import Path
+
+project_root = Path(__file__).parent.parent.parent
+sys.path.insert(0, str(project_root))
+
+if not os.getenv("DATABASE_URL"):
+    _tmpdir = tempfile.mkdtemp()
+    os.environ["DATABASE_URL"] = f"sqlite:///{_tmpdir}/bench.db"
+
+import httpx  # noqa: E402
+from fastapi import Depends, FastAPI  # noqa: E402
+from sqlalchemy.ext.asyncio import AsyncSession  # noqa: E402
+from sqlalchemy.orm import Session  # noqa: E402
+
+from backend import models  # noqa: E402
+from backend.db import SessionLocal, async_engine, ensure_schema  # noqa: E402
+from backend.deps import get_async_db, get_db  # noqa: E402
+from backend.routers.users import _get_user  # noqa: E402
+
+app = FastAPI()
+
+
+@app.get("/sync/{user_id}")
+async def read_user_sync(user_id: str, db: Session = Depends(get_db)):
+    # 旧実装: async def 内で同期クエリ（イベントループをブロック）
+    user = db.query(models.User).filter(models.User.id == user_id).first()
+    return {"id": str(user.id), "results": len(user.results)}
+
+
+@app.get("/async/{user_id}")
+async def read_user_async(user_id: uuid.UUID, db: AsyncSession = Depends(get_async_db)):
+    user = await _get_user(db, user_id)
+    return {"id": str(user.id), "results": len(user.results)}
+
+
+def seed(results_per_user: int) -> str:
+    db = SessionLocal()
+    try:
+        user = models.User(name="bench", grade="5")
+        db.add(user)
+        db.flush()
+        for i in range(results_per_user):
+            db.add(
+                models.UserResult(
+                    user_id=user.id,
+                    date=datetime.date(2020, 1, 1) + datetime.timedelta(days=i),
+                    long_jump_cm=200,
+                    fifty_meter_run_ms=7500,
+                    spider_ms=17000,
+                    eight_shape_run_count=20,
+                    ball_throw_cm=2000,
+                )
+            )
+        db.commit()
+        return str(user.id)
+    finally:
+        db.close()
+
+
+async def run(path: str, total: int, concurrency: int) -> list:
+    latencies = []
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        queue = asyncio.Queue()
+        for _ in range(total):
+            queue.put_nowait(None)
+
+        async def worker():
+            while not queue.empty():
+                queue.get_nowait()
+                start = time.perf_counter()
+                resp = await client.get(path)
+                latencies.append(time.perf_counter() - start)
+                resp.raise_for_status()
+
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+    # 接続はこのイベントループに紐づくため、ループ終了前に破棄する
+    await async_engine.dispose()
+    return latencies
+
+
+def report(label: str, latencies: list, elapsed: float) -> None:
+    ordered = sorted(latencies)
+    p50 = ordered[len(ordered) // 2] * 1000
+    p99 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.99))] * 1000
+    print(
+        f"{label:<8} n={len(ordered):<6} rps={len(ordered) / elapsed:8.1f} "
+        f"mean={statistics.mean(ordered) * 1000:7.2f}ms p50={p50:7.2f}ms p99={p99:7.2f}ms"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--results-per-user", type=int, default=50)
+    args = parser.parse_args()
+
+    ensure_schema()
+    user_id = seed(args.results_per_user)
+
+    for label, prefix in (("sync", "/sync"), ("async", "/async")):
+        start = time.perf_counter()
+        latencies = asyncio.run(run(f"{prefix}/{user_id}", args.requests, args.concurrency))
+        report(label, latencies, time.perf_counter() - start)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""
+測定結果の一括登録ベンチマーク
+
+POST /user_results/ を1件ずつ呼ぶ場合と、POST /user_results/bulk
+（JSON 配列 / NDJSON）で一度に送る場合の rows/sec を比較します。
+
+使用方法:
+    pip install httpx
+    python scripts/bench/bench_bulk_ingest.py --rows 2000
+
+DATABASE_URL が設定されていればそのDBを、なければ一時SQLiteを使用します。
+"""
+import argparse
+import asyncio
+import datetime
+import json
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+project_root = Path(__file__).parent.parent.parent
+sys.path.insert(0, str(project_root))
+
+if not os.getenv("DATABASE_URL"):
+    _tmpdir = tempfile.mkdtemp()
+    os.environ["DATABASE_URL"] = f"sqlite:///{_tmpdir}/bulk.db"
+
+import httpx  # noqa: E402
+
+from backend.db import async_engine, ensure_schema  # noqa: E402
+from backend.main import app  # noqa: E402
+
+
+def make_rows(user_ids: list, count: int) -> list:
+    base = datetime.date(2024, 4, 1)
+    return [
+        {
+            "user_id": user_ids[i % len(user_ids)],
+            "date": str(base + datetime.timedelta(days=i // len(user_ids))),
+            "long_jump_cm": 180 + i % 50,
+            "fifty_meter_run_ms": 7000 + i % 900,
+            "spider_ms": 16000 + i % 2000,
+            "eight_shape_run_count": 15 + i % 10,
+            "ball_throw_cm": 1500 + i % 800,
+            "serfece": 1 + i % 3,
+            "test_format": 1 + i % 2,
+        }
+        for i in range(count)
+    ]
+
+
+async def bench(rows_count: int, athletes: int) -> None:
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        user_ids = []
+        for i in range(athletes):
+            resp = await client.post("/users/", json={"name": f"athlete-{i}", "grade": "5"})
+            user_ids.append(resp.json()["id"])
+        rows = make_rows(user_ids, rows_count)
+
+        start = time.perf_counter()
+        for row in rows:
+            (await client.post("/user_results/", json=row)).raise_for_status()
+        single = time.perf_counter() - start
+
+        start = time.perf_counter()
+        resp = await client.post("/user_results/bulk", json=rows)
+        resp.raise_for_status()
+        bulk_json = time.perf_counter() - start
+        assert resp.json()["inserted"] == rows_count, resp.json()["errors"][:3]
+
+        body = "\n".join(json.dumps(row) for row in rows)
+        start = time.perf_counter()
+        resp = await client.post(
+            "/user_results/bulk", content=body, headers={"content-type": "application/x-ndjson"}
+        )
+        resp.raise_for_status()
+        bulk_ndjson = time.perf_counter() - start
+    await async_engine.dispose()
+
+    for label, elapsed in (
+        ("single", single),
+        ("bulk-json", bulk_json),
+        ("bulk-ndjson", bulk_ndjson),
+    ):
+        print(f"{label:<12} rows={rows_count:<6} {elapsed:7.3f}s  {rows_count / elapsed:10.1f} rows/s")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=2000)
+    parser.add_argument("--athletes", type=int, default=100)
+    args = parser.parse_args()
+
+    ensure_schema()
+    asyncio.run(bench(args.rows, args.athletes))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,165 @@
+"""
+SQLite パフォーマンスプロファイルの同時読み書きベンチマーク
+
+既定設定（rollback journal）と SQLITE_PERFORMANCE_PROFILE の PRAGMA
+（WAL / synchronous=NORMAL / mmap / cache_size / busy_timeout）を適用した
+2つの一時DBに対し、読み込みスレッドと書き込みスレッドを同時に走らせ、
+スループット・p99レイテンシ・"database is locked" エラー数を比較します。
+
+使用方法:
+    python scripts/bench/bench_sqlite_profile.py --readers 8 --writers 2 --seconds 10
+"""
+import argparse
+import datetime
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from pathlib import Path
+
+project_root = Path(__file__).parent.parent.parent
+sys.path.insert(0, str(project_root))
+
+from sqlalchemy import create_engine, event, exc, text  # noqa: E402
+
+from backend.db import Base, apply_sqlite_pragmas  # noqa: E402
+from backend import models  # noqa: E402,F401 - register tables
+
+
+def make_engine(path: str, profile: bool, pool_size: int):
+    engine = create_engine(
+        f"sqlite:///{path}",
+        connect_args={"check_same_thread": False},
+        pool_size=pool_size,
+        max_overflow=0,
+    )
+    if profile:
+        event.listen(engine, "connect", apply_sqlite_pragmas)
+    Base.metadata.create_all(bind=engine)
+    return engine
+
+
+def seed(engine, users: int, results_per_user: int) -> list:
+    user_ids = [str(uuid.uuid4()) for _ in range(users)]
+    with engine.begin() as conn:
+        conn.execute(
+            text("INSERT INTO users (id, name, grade) VALUES (:id, :name, '5')"),
+            [{"id": uid, "name": f"athlete-{i}"} for i, uid in enumerate(user_ids)],
+        )
+        conn.execute(
+            text(
+                "INSERT INTO user_results (user_id, date, long_jump_cm, fifty_meter_run_ms, "
+                "spider_ms, eight_shape_run_count, ball_throw_cm) "
+                "VALUES (:user_id, :date, 200, 7500, 17000, 20, 2000)"
+            ),
+            [
+                {"user_id": uid, "date": datetime.date(2020, 1, 1) + datetime.timedelta(days=d)}
+                for uid in user_ids
+                for d in range(results_per_user)
+            ],
+        )
+    return user_ids
+
+
+def run(engine, user_ids: list, readers: int, writers: int, seconds: float) -> dict:
+    stop = threading.Event()
+    lock = threading.Lock()
+    stats = {"reads": [], "writes": [], "locked": 0}
+
+    def reader(i: int):
+        latencies = []
+        n = 0
+        while not stop.is_set():
+            uid = user_ids[n % len(user_ids)]
+            n += 1
+            start = time.perf_counter()
+            try:
+                with engine.connect() as conn:
+                    conn.execute(
+                        text("SELECT * FROM user_results WHERE user_id = :uid"),
+                        {"uid": uid},
+                    ).fetchall()
+            except exc.OperationalError:
+                with lock:
+                    stats["locked"] += 1
+                continue
+            latencies.append(time.perf_counter() - start)
+        with lock:
+            stats["reads"].extend(latencies)
+
+    def writer(i: int):
+        latencies = []
+        n = 0
+        while not stop.is_set():
+            uid = user_ids[(n + i) % len(user_ids)]
+            n += 1
+            start = time.perf_counter()
+            try:
+                with engine.begin() as conn:
+                    conn.execute(
+                        text(
+                            "INSERT INTO user_results (user_id, date, long_jump_cm, "
+                            "fifty_meter_run_ms, spider_ms, eight_shape_run_count, ball_throw_cm) "
+                            "VALUES (:uid, :date, 210, 7400, 16900, 21, 2100)"
+                        ),
+                        {"uid": uid, "date": datetime.date.today()},
+                    )
+            except exc.OperationalError:
+                with lock:
+                    stats["locked"] += 1
+                continue
+            latencies.append(time.perf_counter() - start)
+        with lock:
+            stats["writes"].extend(latencies)
+
+    threads = [threading.Thread(target=reader, args=(i,)) for i in range(readers)]
+    threads += [threading.Thread(target=writer, args=(i,)) for i in range(writers)]
+    for t in threads:
+        t.start()
+    time.sleep(seconds)
+    stop.set()
+    for t in threads:
+        t.join()
+    return stats
+
+
+def percentile(values: list, q: float) -> float:
+    if not values:
+        return float("nan")
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * q))] * 1000
+
+
+def report(label: str, stats: dict, seconds: float) -> None:
+    for kind in ("reads", "writes"):
+        values = stats[kind]
+        print(
+            f"{label:<8} {kind:<6} ops/s={len(values) / seconds:9.1f} "
+            f"p50={percentile(values, 0.5):7.2f}ms p99={percentile(values, 0.99):8.2f}ms"
+        )
+    print(f"{label:<8} locked errors={stats['locked']}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--readers", type=int, default=8)
+    parser.add_argument("--writers", type=int, default=2)
+    parser.add_argument("--seconds", type=float, default=10.0)
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--results-per-user", type=int, default=20)
+    args = parser.parse_args()
+
+    tmpdir = tempfile.mkdtemp()
+    for label, profile in (("default", False), ("profile", True)):
+        engine = make_engine(
+            f"{tmpdir}/{label}.db", profile, pool_size=args.readers + args.writers
+        )
+        user_ids = seed(engine, args.users, args.results_per_user)
+        stats = run(engine, user_ids, args.readers, args.writers, args.seconds)
+        report(label, stats, args.seconds)
+        engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
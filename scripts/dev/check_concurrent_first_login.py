@@ -0,0 +1,92 @@
+"""
+初回ログイン時の /me 同時リクエスト確認スクリプト
+
+フロントエンドは初回ログイン直後に /me を並列で呼ぶため、同じ firebase_uid の
+ユーザー作成が競合します。新しい uid で /me を同時に N 回呼び、
+
+- すべて 200 で返ること
+- 全レスポンスが同じユーザーIDであること
+- users テーブルにその uid の行が1件だけであること
+
+を確認します。
+
+使用方法:
+    pip install httpx
+    python scripts/dev/check_concurrent_first_login.py --concurrency 20 --rounds 5
+
+DATABASE_URL が設定されていればそのDBを、なければ一時SQLiteを使用します。
+"""
+import argparse
+import asyncio
+import base64
+import json
+import os
+import sys
+import tempfile
+import uuid
+from pathlib import Path
+
+project_root = Path(__file__).parent.parent.parent
+sys.path.insert(0, str(project_root))
+
+if not os.getenv("DATABASE_URL"):
+    _tmpdir = tempfile.mkdtemp()
+    os.environ["DATABASE_URL"] = f"sqlite:///{_tmpdir}/first_login.db"
+# 検証なしモード（署名なしトークン）で実行する
+os.environ["FIREBASE_VERIFY"] = "false"
+
+import httpx  # noqa: E402
+from sqlalchemy import func, select  # noqa: E402
+
+from backend import models  # noqa: E402
+from backend.db import SessionLocal, async_engine, ensure_schema  # noqa: E402
+from backend.main import app  # noqa: E402
+
+
+def unsigned_token(sub: str) -> str:
+    def b64(data: dict) -> str:
+        return base64.urlsafe_b64encode(json.dumps(data).encode()).decode().rstrip("=")
+
+    return f"{b64({'alg': 'none'})}.{b64({'sub': sub})}.sig"
+
+
+async def first_login(concurrency: int) -> tuple:
+    uid = f"first-login-{uuid.uuid4()}"
+    headers = {"Authorization": f"Bearer {unsigned_token(uid)}"}
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://check") as client:
+        responses = await asyncio.gather(
+            *(client.get("/me", headers=headers) for _ in range(concurrency))
+        )
+    await async_engine.dispose()
+    return uid, responses
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--rounds", type=int, default=5)
+    args = parser.parse_args()
+
+    ensure_schema()
+    failed = False
+    for i in range(args.rounds):
+        uid, responses = asyncio.run(first_login(args.concurrency))
+        statuses = sorted({r.status_code for r in responses})
+        ids = {r.json().get("id") for r in responses if r.status_code == 200}
+        db = SessionLocal()
+        try:
+            rows = db.execute(
+                select(func.count()).select_from(models.User).filter(
+                    models.User.firebase_uid == uid)
+            ).scalar()
+        finally:
+            db.close()
+        ok = statuses == [200] and len(ids) == 1 and rows == 1
+        failed = failed or not ok
+        print(f"round {i + 1}: statuses={statuses} distinct_ids={len(ids)} rows={rows} {'OK' if ok else 'NG'}")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()